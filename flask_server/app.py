@@ -1,10 +1,10 @@
-from flask import Flask, request, jsonify, url_for
-from paraphrase import paraphrase
-from predict import run_prediction
+from flask import Flask, request, jsonify, url_for, Response, stream_with_context
+import paraphrase as paraphrase_module
+from paraphrase import paraphrase, batcher as paraphrase_batcher, memo as paraphrase_memo, PARAPHRASE_PROFILES
 from io import StringIO
+import io
 import json
 from flask_cors import CORS
-import PyPDF2
 import requests
 from dotenv import load_dotenv
 import os
@@ -12,9 +12,25 @@ import re
 import numpy as np
 import hashlib
 import time
+import sys
+import importlib.util
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+from retrieval import ChunkIndex, build_retrieval_index
+from embeddings import HybridIndex, build_hybrid_index, chunk_embedder
+from context_packer import count_tokens, create_context_packer
+from question_batching import group_questions, merge_rankings, parse_numbered_answers
+from cache_backends import create_cache_backend
+from http_client import PooledHTTPClient, RateLimitError, parse_retry_after
+from llm_cache import LLMResponseCache
+from pdf_extractors import extract_pdf_text, iter_pdf_pages
+from ingest import ingest_pages
+from chunking import chunk_text
+from jobs import JobManager, create_job_store
+from simplifier import create_chunk_simplifier
+from validation_cascade import create_validation_cascade
+from phrase_matcher import PhraseMatcher
 
 # Import libraries for document and image processing
 try:
@@ -27,17 +43,26 @@ except ImportError:
 try:
     from PIL import Image
     import pytesseract
-    import easyocr
-    OCR_AVAILABLE = True
-    # Initialize EasyOCR reader
-    ocr_reader = easyocr.Reader(['en'])
+    # easyocr pulls in torch, so only check it is installed here and import it on first use
+    OCR_AVAILABLE = importlib.util.find_spec('easyocr') is not None
 except ImportError:
     OCR_AVAILABLE = False
+if not OCR_AVAILABLE:
     print("OCR libraries not available, image text extraction disabled")
 
-# GPU acceleration disabled - CuPy removed from dependencies
-# Keep GPU_AVAILABLE flag for compatibility with existing code paths
-GPU_AVAILABLE = False
+ocr_reader = None
+ocr_reader_lock = threading.Lock()
+
+def get_ocr_reader():
+    """Create the EasyOCR reader on first use"""
+    global ocr_reader
+    with ocr_reader_lock:
+        if ocr_reader is None:
+            import easyocr
+            start_time = time.time()
+            ocr_reader = easyocr.Reader(['en'])
+            print(f"EasyOCR reader initialized in {time.time() - start_time:.2f}s")
+    return ocr_reader
 
 load_dotenv()
 
@@ -51,60 +76,159 @@ pdf_cache = {}
 cache_lock = threading.Lock()
 
 class PDFCache:
-    def __init__(self):
-        self.cache = {}
-        self.cache_timestamps = {}
+    def __init__(self, backend=None):
+        self.backend = backend or create_cache_backend()
         self.max_cache_age = timedelta(hours=24)  # Cache for 24 hours
         self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        # Documents still ingesting in this process, by file hash
+        self.partial_entries = {}
+        self.sweeper_thread = None
+        self.sweeper_stop = threading.Event()
+        print(f"PDF cache using {self.backend.name} backend")
     
     def get_file_hash(self, file_content):
         """Generate hash for file content"""
         return hashlib.md5(file_content).hexdigest()
     
+    def _is_expired(self, entry):
+        return datetime.now() - entry['processed_at'] > self.max_cache_age
+    
+    def lookup(self, file_hash):
+        """Fetch a cached, unexpired entry; returns None on a miss"""
+        with self.lock:
+            entry = self.partial_entries.get(file_hash)
+            if entry is not None:
+                self.hits += 1
+                return entry
+        
+        # Backend I/O runs outside the lock, which only guards in-process state
+        entry = self.backend.get(file_hash)
+        
+        # Check if cache is expired
+        expired = entry is not None and self._is_expired(entry)
+        if expired:
+            self.backend.delete(file_hash)
+            entry = None
+        
+        with self.lock:
+            if expired:
+                self.expirations += 1
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+    
     def is_cached(self, file_hash):
         """Check if file chunks are cached and not expired"""
-        with self.lock:
-            if file_hash not in self.cache:
-                return False
-            
-            # Check if cache is expired
-            if datetime.now() - self.cache_timestamps[file_hash] > self.max_cache_age:
-                del self.cache[file_hash]
-                del self.cache_timestamps[file_hash]
-                return False
-            
-            return True
+        return self.lookup(file_hash) is not None
     
     def get_chunks(self, file_hash):
         """Get cached chunks"""
+        return self.lookup(file_hash) or {}
+    
+    def store_chunks(self, file_hash, text, chunks, simplified_chunks=None, index=None):
+        """Store processed chunks in cache along with their inverted index"""
+        # Without simplification both keys share one list, so nothing is duplicated
+        simplified_chunks = simplified_chunks or chunks
+        # Index the chunks questions are answered from, outside the lock
+        if index is None or simplified_chunks is not chunks:
+            index = ChunkIndex(simplified_chunks)
+        index = build_hybrid_index(simplified_chunks, build_retrieval_index(simplified_chunks, index))
+        entry = {
+            'text': text,
+            'chunks': chunks,
+            'simplified_chunks': simplified_chunks,
+            'index': index,
+            'processed_at': datetime.now()
+        }
+        self.backend.set(file_hash, entry, ttl_seconds=self.max_cache_age.total_seconds())
         with self.lock:
-            return self.cache.get(file_hash, {})
+            self.partial_entries.pop(file_hash, None)
     
-    def store_chunks(self, file_hash, text, chunks, simplified_chunks=None):
-        """Store processed chunks in cache"""
+    def store_partial(self, file_hash, chunks, index, pages_ingested):
+        """
+        Publish a snapshot of the chunks of a document that is still being
+        ingested. Partial entries stay in this process instead of going to
+        the backend, so publishing never re-sizes or re-serialises the
+        growing document; other workers see it once it is stored complete.
+        """
+        entry = {
+            'text': None,
+            'chunks': chunks,
+            'simplified_chunks': chunks,
+            'index': index,
+            'processed_at': datetime.now(),
+            'partial': True,
+            'pages_ingested': pages_ingested
+        }
         with self.lock:
-            self.cache[file_hash] = {
-                'text': text,
-                'chunks': chunks,
-                'simplified_chunks': simplified_chunks or chunks,
-                'processed_at': datetime.now()
-            }
-            self.cache_timestamps[file_hash] = datetime.now()
+            self.partial_entries[file_hash] = entry
+    
+    def discard(self, file_hash):
+        """Remove an entry, e.g. a partial one whose ingestion failed"""
+        with self.lock:
+            self.partial_entries.pop(file_hash, None)
+        self.backend.delete(file_hash)
     
     def clear_expired(self):
         """Clear expired cache entries"""
+        removed = self.backend.delete_expired()
+        with self.lock:
+            self.expirations += removed
+        return removed
+    
+    def start_sweeper(self, interval_seconds):
+        """Start a daemon thread that clears expired entries every interval_seconds"""
+        if self.sweeper_thread is not None:
+            return
+        
+        def sweep():
+            while not self.sweeper_stop.wait(interval_seconds):
+                try:
+                    removed = self.clear_expired()
+                    if removed:
+                        print(f"PDF cache sweeper removed {removed} expired entries")
+                except Exception as e:
+                    print(f"PDF cache sweeper error: {e}")
+        
+        self.sweeper_thread = threading.Thread(target=sweep, name="pdf-cache-sweeper", daemon=True)
+        self.sweeper_thread.start()
+    
+    def stop_sweeper(self):
+        """Stop the background sweeper thread"""
+        self.sweeper_stop.set()
+        if self.sweeper_thread is not None:
+            self.sweeper_thread.join()
+            self.sweeper_thread = None
+        self.sweeper_stop.clear()
+    
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        size_bytes = self.backend.size_bytes()
         with self.lock:
-            current_time = datetime.now()
-            expired_keys = [
-                key for key, timestamp in self.cache_timestamps.items()
-                if current_time - timestamp > self.max_cache_age
-            ]
-            for key in expired_keys:
-                del self.cache[key]
-                del self.cache_timestamps[key]
-
-# Initialize PDF cache
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.backend.evictions,
+                "expirations": self.expirations,
+                "size_bytes": size_bytes,
+                "max_bytes": getattr(self.backend, 'max_bytes', None),
+                "ingesting": len(self.partial_entries)
+            }
+
+# Initialize PDF cache and its background expiry sweeper
 pdf_cache = PDFCache()
+pdf_cache.start_sweeper(int(os.getenv('PDF_CACHE_SWEEP_INTERVAL', '600')))
+
+# Background ingestion jobs; job state has its own store, apart from the document cache
+job_manager = JobManager(create_job_store(), max_workers=int(os.getenv('INGEST_JOB_WORKERS', '2')))
 
 # Configure OpenRouter API
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
@@ -119,14 +243,36 @@ AVAILABLE_MODELS = [
     'openai/gpt-3.5-turbo'
 ]
 
+# Shared keep-alive connection pool for all OpenRouter calls
+openrouter_client = PooledHTTPClient(
+    pool_size=int(os.getenv('OPENROUTER_POOL_SIZE', '10')),
+    connect_timeout=float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', '5')),
+    read_timeout=float(os.getenv('OPENROUTER_READ_TIMEOUT', '60')),
+    max_retries=int(os.getenv('OPENROUTER_MAX_RETRIES', '3'))
+)
+
+# Cache for deterministic LLM responses (validation, simplification, repeat questions)
+llm_cache = None
+if os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true':
+    llm_cache = LLMResponseCache(
+        max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+        ttl_seconds=int(os.getenv('LLM_CACHE_TTL_SECONDS', str(24 * 3600))),
+        path=os.getenv('LLM_CACHE_PATH'),
+        max_temperature=float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', '0.3'))
+    )
+
 if OPENROUTER_API_KEY:
     print(f"OpenRouter API configured with model: {CURRENT_MODEL}")
 else:
     print("Warning: OPENROUTER_API_KEY not found in environment variables")
 
-def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
+def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7, use_cache=None, retry_on_429=True):
     """
-    Call OpenRouter API with the given prompt
+    Call OpenRouter API with the given prompt.
+    Low-temperature calls are served from the LLM response cache when possible;
+    use_cache=True/False forces caching on or off regardless of temperature.
+    retry_on_429=False raises RateLimitError on the first 429, without
+    client retries or fallback models, for callers with their own backoff.
     """
     if not OPENROUTER_API_KEY:
         raise ValueError("OpenRouter API key not configured")
@@ -134,6 +280,23 @@ def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
     # Use the specified model or fall back to the current model
     model_to_use = model or CURRENT_MODEL
     
+    if llm_cache is None or not llm_cache.should_cache(temperature, use_cache):
+        return request_openrouter_completion(prompt, model_to_use, max_tokens, temperature, retry_on_429)
+    
+    cache_key = llm_cache.make_key(model_to_use, prompt, max_tokens, temperature)
+    cached_response = llm_cache.get(cache_key)
+    if cached_response is not None:
+        print("Using cached LLM response")
+        return cached_response
+    
+    response = request_openrouter_completion(prompt, model_to_use, max_tokens, temperature, retry_on_429)
+    llm_cache.set(cache_key, response)
+    return response
+
+def request_openrouter_completion(prompt, model_to_use, max_tokens, temperature, retry_on_429=True):
+    """
+    Send a chat completion request to OpenRouter, trying fallback models if the requested one fails
+    """
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
@@ -151,13 +314,17 @@ def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
     }
     
     try:
-        response = requests.post(
+        response = openrouter_client.post(
             f"{OPENROUTER_BASE_URL}/chat/completions",
             headers=headers,
             json=data,
-            timeout=60
+            retry_on_429=retry_on_429
         )
         
+        if response.status_code == 429 and not retry_on_429:
+            raise RateLimitError(f"OpenRouter API rate limited: {response.text}",
+                                 retry_after=parse_retry_after(response.headers.get('Retry-After')))
+        
         if response.status_code == 200:
             result = response.json()
             if 'choices' in result and len(result['choices']) > 0:
@@ -171,11 +338,10 @@ def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
                 for fallback_model in fallback_models:
                     try:
                         data["model"] = fallback_model
-                        fallback_response = requests.post(
+                        fallback_response = openrouter_client.post(
                             f"{OPENROUTER_BASE_URL}/chat/completions",
                             headers=headers,
-                            json=data,
-                            timeout=60
+                            json=data
                         )
                         if fallback_response.status_code == 200:
                             result = fallback_response.json()
@@ -185,6 +351,9 @@ def call_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
                     except Exception as e:
                         continue
             
+            if response.status_code == 429:
+                raise RateLimitError(f"OpenRouter API rate limited: {response.text}",
+                                     retry_after=parse_retry_after(response.headers.get('Retry-After')))
             raise ValueError(f"OpenRouter API error: {response.status_code} - {response.text}")
             
     except requests.exceptions.Timeout:
@@ -205,10 +374,10 @@ def list_available_models():
     }
     
     try:
-        response = requests.get(
+        response = openrouter_client.get(
             f"{OPENROUTER_BASE_URL}/models",
             headers=headers,
-            timeout=10
+            timeout=(openrouter_client.connect_timeout, 10)
         )
         
         if response.status_code == 200:
@@ -220,6 +389,63 @@ def list_available_models():
         return AVAILABLE_MODELS
 
 
+def stream_openrouter_api(prompt, model=None, max_tokens=4000, temperature=0.7):
+    """
+    Call OpenRouter with a streamed chat completion, yielding content deltas as they arrive
+    """
+    if not OPENROUTER_API_KEY:
+        raise ValueError("OpenRouter API key not configured")
+    
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5000",
+        "X-Title": "Legal AI Assistant"
+    }
+    
+    data = {
+        "model": model or CURRENT_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True
+    }
+    
+    try:
+        response = openrouter_client.post(
+            f"{OPENROUTER_BASE_URL}/chat/completions",
+            headers=headers,
+            json=data,
+            stream=True
+        )
+    except requests.exceptions.Timeout:
+        raise ValueError("Request to OpenRouter API timed out")
+    except requests.exceptions.RequestException as e:
+        raise ValueError(f"Request to OpenRouter API failed: {str(e)}")
+    
+    with response:
+        if response.status_code != 200:
+            raise ValueError(f"OpenRouter API error: {response.status_code} - {response.text}")
+        
+        for line in response.iter_lines(decode_unicode=True):
+            # Skip keep-alive comments and blank separators between events
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                break
+            
+            event = json.loads(payload)
+            if 'error' in event:
+                raise ValueError(f"OpenRouter API error: {event['error']}")
+            choices = event.get('choices') or []
+            if choices:
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+
 
 def validate_legal_document_with_ai(text_chunks):
     """
@@ -333,18 +559,9 @@ def load_questions_short():
 
 
 def extract_text_from_pdf(file):
-    """Extract text from PDF file"""
+    """Extract text from PDF file using the configured extractor (PDF_EXTRACTOR)"""
     try:
-        print(f"DEBUG: PDF extraction - file position before: {file.tell()}")
-        pdf_reader = PyPDF2.PdfReader(file)
-        print(f"DEBUG: PDF reader created, pages: {len(pdf_reader.pages)}")
-        text = ""
-        for i, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            print(f"DEBUG: Page {i+1} text length: {len(page_text)}")
-            text += page_text + "\n"
-        print(f"DEBUG: Total PDF text length: {len(text)}")
-        return text
+        return extract_pdf_text(file.read())
     except Exception as e:
         print(f"Error extracting PDF text: {e}")
         return None
@@ -389,7 +606,7 @@ def extract_text_from_image(file):
         try:
             # Reset file pointer for EasyOCR
             file.seek(0)
-            results = ocr_reader.readtext(file.read())
+            results = get_ocr_reader().readtext(file.read())
             text = " ".join([result[1] for result in results])
             if text.strip():
                 return text
@@ -461,6 +678,91 @@ def extract_text_from_file(file, file_type):
     else:
         return None
 
+def iter_file_pages(file, file_type):
+    """
+    Yield the text of a file page by page for the ingest pipeline. PDFs
+    stream page by page; other formats are extracted as a single page.
+    Raises ValueError when no text can be extracted.
+    """
+    if file_type == 'pdf':
+        try:
+            yield from iter_pdf_pages(file.read())
+        except Exception as e:
+            print(f"Error extracting PDF text: {e}")
+            raise ValueError(f"Error extracting text from PDF: {e}")
+        return
+    
+    text_content = extract_text_from_file(file, file_type)
+    if text_content is None:
+        raise ValueError(f"Error extracting text from {file_type} file")
+    yield text_content
+
+# Legal keywords and phrases categorized by strength
+STRONG_LEGAL_INDICATORS = [
+    'whereas', 'wherefore', 'heretofore', 'hereinafter', 'party of the first part',
+    'party of the second part', 'in witness whereof', 'terms and conditions',
+    'force and effect', 'null and void', 'ipso facto', 'prima facie',
+    'res ipsa loquitur', 'quid pro quo', 'habeas corpus', 'amicus curiae',
+    'statutory', 'jurisdiction', 'litigation', 'plaintiff', 'defendant',
+    'appellant', 'appellee', 'breach of contract', 'damages', 'injunction',
+    'cease and desist', 'intellectual property', 'copyright', 'trademark',
+    'patent', 'confidentiality agreement', 'non-disclosure', 'indemnification',
+    'liability', 'negligence', 'tort', 'covenant', 'warranty', 'representation',
+    'arbitration', 'mediation', 'settlement', 'judgment', 'decree',
+    'subpoena', 'deposition', 'affidavit', 'exhibit', 'evidence'
+]
+
+MEDIUM_LEGAL_INDICATORS = [
+    'contract', 'agreement', 'legal', 'law', 'clause', 'section', 'provision',
+    'article', 'amendment', 'regulation', 'statute', 'code', 'act',
+    'compliance', 'violation', 'breach', 'obligation', 'right', 'duty',
+    'consent', 'authorization', 'license', 'permit', 'certificate',
+    'court', 'judge', 'jury', 'trial', 'hearing', 'proceeding',
+    'motion', 'brief', 'pleading', 'complaint', 'answer', 'counter-claim',
+    'discovery', 'interrogatory', 'admission', 'penalty', 'fine',
+    'sanction', 'punishment', 'sentence', 'probation', 'parole'
+]
+
+WEAK_LEGAL_INDICATORS = [
+    'shall', 'may', 'must', 'required', 'prohibited', 'permitted',
+    'entitled', 'responsible', 'accountable', 'binding', 'enforceable',
+    'effective', 'terminate', 'expire', 'renew', 'modify', 'amend',
+    'notify', 'inform', 'disclose', 'confidential', 'proprietary',
+    'ownership', 'title', 'interest', 'benefit', 'consideration',
+    'payment', 'compensation', 'fee', 'cost', 'expense'
+]
+
+# Document structure indicators
+STRUCTURE_INDICATORS = [
+    'article i', 'article 1', 'section 1', 'section i', 'clause',
+    'subsection', 'paragraph', 'subparagraph', 'exhibit a', 'exhibit 1',
+    'schedule a', 'schedule 1', 'appendix a', 'appendix 1',
+    'witnesseth', 'recitals', 'definitions', 'interpretation'
+]
+
+# Legal document types
+LEGAL_DOCUMENT_TYPES = [
+    'lease agreement', 'rental agreement', 'employment contract',
+    'service agreement', 'purchase agreement', 'sales contract',
+    'partnership agreement', 'shareholders agreement', 'merger agreement',
+    'acquisition agreement', 'licensing agreement', 'franchise agreement',
+    'joint venture agreement', 'non-compete agreement', 'severance agreement',
+    'settlement agreement', 'plea agreement', 'divorce decree',
+    'custody agreement', 'will and testament', 'trust agreement',
+    'power of attorney', 'mortgage', 'deed', 'title', 'lien',
+    'security agreement', 'promissory note', 'loan agreement',
+    'credit agreement', 'insurance policy', 'warranty',
+    'terms of service', 'privacy policy', 'user agreement',
+    'software license', 'copyright license', 'trademark license',
+    'patent license', 'assignment agreement', 'transfer agreement'
+]
+
+# All indicator phrases, matched in a single pass over the document
+LEGAL_INDICATOR_MATCHER = PhraseMatcher(
+    STRONG_LEGAL_INDICATORS + MEDIUM_LEGAL_INDICATORS + WEAK_LEGAL_INDICATORS +
+    STRUCTURE_INDICATORS + LEGAL_DOCUMENT_TYPES
+)
+
 def is_legal_document(text_content):
     """
     Validate if the document content appears to be a legal document
@@ -472,72 +774,13 @@ def is_legal_document(text_content):
     # Convert to lowercase for analysis
     text_lower = text_content.lower()
     
-    # Legal keywords and phrases categorized by strength
-    strong_legal_indicators = [
-        'whereas', 'wherefore', 'heretofore', 'hereinafter', 'party of the first part',
-        'party of the second part', 'in witness whereof', 'terms and conditions',
-        'force and effect', 'null and void', 'ipso facto', 'prima facie',
-        'res ipsa loquitur', 'quid pro quo', 'habeas corpus', 'amicus curiae',
-        'statutory', 'jurisdiction', 'litigation', 'plaintiff', 'defendant',
-        'appellant', 'appellee', 'breach of contract', 'damages', 'injunction',
-        'cease and desist', 'intellectual property', 'copyright', 'trademark',
-        'patent', 'confidentiality agreement', 'non-disclosure', 'indemnification',
-        'liability', 'negligence', 'tort', 'covenant', 'warranty', 'representation',
-        'arbitration', 'mediation', 'settlement', 'judgment', 'decree',
-        'subpoena', 'deposition', 'affidavit', 'exhibit', 'evidence'
-    ]
-    
-    medium_legal_indicators = [
-        'contract', 'agreement', 'legal', 'law', 'clause', 'section', 'provision',
-        'article', 'amendment', 'regulation', 'statute', 'code', 'act',
-        'compliance', 'violation', 'breach', 'obligation', 'right', 'duty',
-        'consent', 'authorization', 'license', 'permit', 'certificate',
-        'court', 'judge', 'jury', 'trial', 'hearing', 'proceeding',
-        'motion', 'brief', 'pleading', 'complaint', 'answer', 'counter-claim',
-        'discovery', 'interrogatory', 'admission', 'penalty', 'fine',
-        'sanction', 'punishment', 'sentence', 'probation', 'parole'
-    ]
-    
-    weak_legal_indicators = [
-        'shall', 'may', 'must', 'required', 'prohibited', 'permitted',
-        'entitled', 'responsible', 'accountable', 'binding', 'enforceable',
-        'effective', 'terminate', 'expire', 'renew', 'modify', 'amend',
-        'notify', 'inform', 'disclose', 'confidential', 'proprietary',
-        'ownership', 'title', 'interest', 'benefit', 'consideration',
-        'payment', 'compensation', 'fee', 'cost', 'expense'
-    ]
-    
-    # Document structure indicators
-    structure_indicators = [
-        'article i', 'article 1', 'section 1', 'section i', 'clause',
-        'subsection', 'paragraph', 'subparagraph', 'exhibit a', 'exhibit 1',
-        'schedule a', 'schedule 1', 'appendix a', 'appendix 1',
-        'witnesseth', 'recitals', 'definitions', 'interpretation'
-    ]
-    
-    # Legal document types
-    document_types = [
-        'lease agreement', 'rental agreement', 'employment contract',
-        'service agreement', 'purchase agreement', 'sales contract',
-        'partnership agreement', 'shareholders agreement', 'merger agreement',
-        'acquisition agreement', 'licensing agreement', 'franchise agreement',
-        'joint venture agreement', 'non-compete agreement', 'severance agreement',
-        'settlement agreement', 'plea agreement', 'divorce decree',
-        'custody agreement', 'will and testament', 'trust agreement',
-        'power of attorney', 'mortgage', 'deed', 'title', 'lien',
-        'security agreement', 'promissory note', 'loan agreement',
-        'credit agreement', 'insurance policy', 'warranty',
-        'terms of service', 'privacy policy', 'user agreement',
-        'software license', 'copyright license', 'trademark license',
-        'patent license', 'assignment agreement', 'transfer agreement'
-    ]
-    
-    # Count indicators
-    strong_count = sum(1 for indicator in strong_legal_indicators if indicator in text_lower)
-    medium_count = sum(1 for indicator in medium_legal_indicators if indicator in text_lower)
-    weak_count = sum(1 for indicator in weak_legal_indicators if indicator in text_lower)
-    structure_count = sum(1 for indicator in structure_indicators if indicator in text_lower)
-    doc_type_count = sum(1 for doc_type in document_types if doc_type in text_lower)
+    # Find every indicator in one pass, then count per category
+    found = LEGAL_INDICATOR_MATCHER.find(text_lower)
+    strong_count = sum(1 for indicator in STRONG_LEGAL_INDICATORS if indicator in found)
+    medium_count = sum(1 for indicator in MEDIUM_LEGAL_INDICATORS if indicator in found)
+    weak_count = sum(1 for indicator in WEAK_LEGAL_INDICATORS if indicator in found)
+    structure_count = sum(1 for indicator in STRUCTURE_INDICATORS if indicator in found)
+    doc_type_count = sum(1 for doc_type in LEGAL_DOCUMENT_TYPES if doc_type in found)
     
     # Calculate weighted score
     score = (
@@ -558,259 +801,40 @@ def is_legal_document(text_content):
     # Collect detected indicators for feedback
     detected_indicators = []
     if strong_count > 0:
-        detected_indicators.extend([ind for ind in strong_legal_indicators if ind in text_lower][:3])
+        detected_indicators.extend([ind for ind in STRONG_LEGAL_INDICATORS if ind in found][:3])
     if medium_count > 0:
-        detected_indicators.extend([ind for ind in medium_legal_indicators if ind in text_lower][:3])
+        detected_indicators.extend([ind for ind in MEDIUM_LEGAL_INDICATORS if ind in found][:3])
     if doc_type_count > 0:
-        detected_indicators.extend([doc_type for doc_type in document_types if doc_type in text_lower][:2])
+        detected_indicators.extend([doc_type for doc_type in LEGAL_DOCUMENT_TYPES if doc_type in found][:2])
     
     confidence = min(normalized_score / 20, 1.0)  # Convert to 0-1 scale with lower denominator
     
     return is_legal, confidence, detected_indicators[:5]  # Return top 5 indicators
 
-def chunk_text_gpu_optimized(text, chunk_size=2000, overlap=200):
-    """Optimized GPU-accelerated text chunking using CuPy with parallel processing"""
-    if not GPU_AVAILABLE:
-        return chunk_text_cpu_parallel(text, chunk_size, overlap)
-    
-    try:
-        if len(text) <= chunk_size:
-            return [text]
-        
-        start_time = time.time()
-        print(f"Starting GPU chunking for text of length {len(text)}")
-        
-        # Pre-compute chunk boundaries for parallel processing
-        text_len = len(text)
-        chunk_starts = []
-        start = 0
-        
-        while start < text_len:
-            chunk_starts.append(start)
-            start += chunk_size - overlap
-        
-        # Process chunks in parallel using GPU
-        chunks = []
-        batch_size = min(10, len(chunk_starts))  # Process in batches to manage GPU memory
-        
-        for i in range(0, len(chunk_starts), batch_size):
-            batch_starts = chunk_starts[i:i + batch_size]
-            batch_chunks = []
-            
-            for start in batch_starts:
-                end = min(start + chunk_size, text_len)
-                chunk = text[start:end]
-                
-                # Try to end chunk at a sentence boundary
-                if end < text_len:
-                    sentence_end = chunk.rfind('.')
-                    if sentence_end > chunk_size * 0.7:
-                        chunk = chunk[:sentence_end + 1]
-                
-                batch_chunks.append(chunk.strip())
-            
-            chunks.extend(batch_chunks)
-            
-            # Remove arbitrary limit - process entire document
-        
-        end_time = time.time()
-        print(f"GPU chunking completed in {end_time - start_time:.2f}s, created {len(chunks)} chunks")
-        
-        return chunks
-        
-    except Exception as e:
-        print(f"GPU chunking failed: {e}, falling back to CPU")
-        return chunk_text_cpu_parallel(text, chunk_size, overlap)
-
-def chunk_text_cpu_parallel(text, chunk_size=2000, overlap=200):
-    """CPU-based parallel text chunking"""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    start_time = time.time()
-    print(f"Starting CPU parallel chunking for text of length {len(text)}")
-    
-    # Pre-compute chunk boundaries
-    text_len = len(text)
-    chunk_starts = []
-    start = 0
-    
-    while start < text_len:
-        chunk_starts.append(start)
-        start += chunk_size - overlap
-    
-    def process_chunk(start):
-        end = min(start + chunk_size, text_len)
-        chunk = text[start:end]
-        
-        # Try to end chunk at a sentence boundary
-        if end < text_len:
-            sentence_end = chunk.rfind('.')
-            if sentence_end > chunk_size * 0.7:
-                chunk = chunk[:sentence_end + 1]
-        
-        return chunk.strip()
-    
-    # Use ThreadPoolExecutor for parallel processing - process ALL chunks
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        chunks = list(executor.map(process_chunk, chunk_starts))  # Process entire document
-    
-    end_time = time.time()
-    print(f"CPU parallel chunking completed in {end_time - start_time:.2f}s, created {len(chunks)} chunks")
-    
-    return chunks
-
-def chunk_text_gpu(text, chunk_size=2000, overlap=200):
-    """Legacy GPU chunking function - kept for compatibility"""
-    return chunk_text_gpu_optimized(text, chunk_size, overlap)
-
-def chunk_text_cpu(text, chunk_size=2000, overlap=200):
-    """CPU-based text chunking (fallback)"""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        
-        # Try to end chunk at a sentence boundary
-        if end < len(text):
-            sentence_end = chunk.rfind('.')
-            if sentence_end > chunk_size * 0.7:  # Only if we find a sentence end in the latter part
-                chunk = chunk[:sentence_end + 1]
-                end = start + sentence_end + 1
-        
-        chunks.append(chunk.strip())
-        start = end - overlap
-        
-        if start >= len(text):
-            break
-    
-    return chunks
-
-def chunk_text(text, chunk_size=3000, overlap=300):
-    """Fast chunking function with larger chunks for better performance"""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    print("Using fast chunking mode")
-    
-    # Simple fast chunking without GPU overhead for better speed
-    chunks = []
-    start = 0
-    chunk_count = 0
-    
-    while start < len(text) and chunk_count < 20:  # Limit chunks for speed
-        end = start + chunk_size
-        chunk = text[start:end]
-        
-        # Try to end chunk at a sentence boundary
-        if end < len(text):
-            sentence_end = chunk.rfind('.')
-            if sentence_end > chunk_size * 0.7:
-                chunk = chunk[:sentence_end + 1]
-                end = start + sentence_end + 1
-        
-        chunks.append(chunk.strip())
-        start = end - overlap
-        chunk_count += 1
-        
-        if start >= len(text):
-            break
-    
-    print(f"Fast chunking completed: created {len(chunks)} chunks")
-    return chunks
+# Local-first document validation: keyword scorer, optional local classifier, then the LLM
+validation_cascade = create_validation_cascade(is_legal_document, validate_legal_document_with_ai)
 
 # Available models function removed - using Gemini API directly
 
-def find_relevant_chunks(question, text_chunks):
-    """Find chunks most relevant to the question using advanced keyword matching and scoring"""
-    import re
-    
-    # Extract key terms from the question
-    question_lower = question.lower()
-    
-    # Score ALL chunks for complete document coverage
-    chunk_scores = []
-    
-    print(f"Analyzing {len(text_chunks)} chunks for relevance...")
-    
-    for i, chunk in enumerate(text_chunks):
-        chunk_lower = chunk.lower()
-        score = 0
-        
-        # Extract key terms from question (remove common words)
-        question_words = re.findall(r'\b\w+\b', question_lower)
-        key_terms = [word for word in question_words if len(word) > 2 and 
-                    word not in ['what', 'when', 'where', 'which', 'that', 'this', 'they', 'with', 'from', 'have', 'been', 'will', 'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'she', 'use', 'her', 'now', 'him', 'way']]
-        
-        # Enhanced scoring system
-        for term in key_terms:
-            if term in chunk_lower:
-                # Weight by frequency and term importance
-                frequency = chunk_lower.count(term)
-                if len(term) > 4:  # Longer terms are more specific
-                    score += frequency * 3
-                else:
-                    score += frequency * 2
-        
-        # Look for legal section references (high priority)
-        section_matches = re.findall(r'§\s*\d+(?:\([a-z]\))?', chunk)
-        if section_matches:
-            score += len(section_matches) * 10
-            
-        # Look for general section references
-        if re.search(r'section\s+\d+', chunk_lower):
-            score += 5
-            
-        # Look for subsection references  
-        if re.search(r'\(\w+\)', chunk):
-            score += 2
-            
-        # Enhanced legal term matching
-        legal_terms = {
-            'payment': 8, 'trustee': 10, 'compensation': 8, 'fee': 6, 
-            'multiple': 5, 'assigned': 7, 'receives': 8, 'entitled': 7,
-            'distribution': 6, 'allocation': 6, 'divided': 5, 'shared': 5,
-            'court': 4, 'order': 4, 'approval': 5, 'bankruptcy': 8,
-            'estate': 6, 'debtor': 6, 'creditor': 5, 'proceeding': 4
-        }
-        
-        for term, weight in legal_terms.items():
-            if term in question_lower and term in chunk_lower:
-                score += chunk_lower.count(term) * weight
-        
-        # Contextual bonuses
-        if 'multiple' in question_lower and 'trustee' in question_lower:
-            if 'multiple' in chunk_lower and 'trustee' in chunk_lower:
-                score += 15  # High relevance for multiple trustee questions
-        
-        # Boost score for chunks with numbers/amounts (often relevant to payment questions)
-        if re.search(r'\$[\d,]+', chunk) or re.search(r'\b\d+\.\d+\b', chunk):
-            score += 3
-            
-        # Boost for procedural language
-        procedural_terms = ['shall', 'must', 'required', 'entitled', 'pursuant', 'accordance']
-        for term in procedural_terms:
-            if term in chunk_lower:
-                score += 2
-        
-        chunk_scores.append((score, i, chunk))
-    
-    # Sort by score (highest first)
-    chunk_scores.sort(key=lambda x: x[0], reverse=True)
+def rank_chunks(question, text_chunks, index=None, top_k=None):
+    """Rank chunks by relevance to the question; returns [(score, chunk_id)], best first"""
+    if index is None:
+        # Legacy callers without a cached index - build one for this request
+        index = ChunkIndex(text_chunks)
     
-    # Return ALL chunks in order of relevance (no filtering by score)
-    # This ensures complete document coverage
-    relevant_chunks = [chunk for score, i, chunk in chunk_scores]
+    top_k = top_k or len(text_chunks)
+    ranked = index.top_k(question, top_k)
     
     # Log scoring results
-    high_score_count = len([s for s, i, c in chunk_scores if s > 0])
-    print(f"Ranked all {len(relevant_chunks)} chunks by relevance ({high_score_count} with positive scores)")
+    high_score_count = len([score for score, chunk_id in ranked if score > 0])
+    print(f"Ranked top {len(ranked)} of {len(text_chunks)} chunks by relevance ({high_score_count} with positive scores)")
     
-    return relevant_chunks
+    return ranked
+
+def find_relevant_chunks(question, text_chunks, index=None, top_k=None):
+    """Find chunks most relevant to the question using the document's inverted index and BM25 scoring"""
+    ranked = rank_chunks(question, text_chunks, index=index, top_k=top_k)
+    return [text_chunks[chunk_id] for score, chunk_id in ranked]
 
 def simplify_chunk_with_gemini(chunk):
     """Simplify a text chunk using OpenRouter API"""
@@ -818,7 +842,17 @@ def simplify_chunk_with_gemini(chunk):
         return chunk  # Return original chunk if API not available
     
     try:
-        prompt = f"""
+        return request_chunk_simplification(chunk, retry_on_429=True)
+    except Exception as e:
+        print(f"Error simplifying chunk with OpenRouter: {e}")
+        return chunk  # Return original chunk if simplification fails
+
+def request_chunk_simplification(chunk, retry_on_429=False):
+    """
+    Simplify a text chunk, raising on failure. By default the first 429
+    raises RateLimitError so the ChunkSimplifier limiter backs off at once.
+    """
+    prompt = f"""
         Please simplify and extract the key legal information from the following text chunk. 
         Focus on important contractual details like parties, dates, terms, obligations, and conditions.
         Keep the essential information while removing unnecessary verbosity.
@@ -828,92 +862,216 @@ def simplify_chunk_with_gemini(chunk):
         
         Simplified version:
         """
-        
-        response = call_openrouter_api(prompt, max_tokens=2000, temperature=0.3)
-        return response.strip()
-    except Exception as e:
-        print(f"Error simplifying chunk with OpenRouter: {e}")
-        return chunk  # Return original chunk if simplification fails
+    
+    response = call_openrouter_api(prompt, max_tokens=2000, temperature=0.3, retry_on_429=retry_on_429)
+    return response.strip()
+
+# I/O pool for per-file extraction and validation in /upload-multiple
+upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv('UPLOAD_IO_WORKERS', '8')), thread_name_prefix='upload')
+
+# Concurrent chunk simplification for uploads; documents up to
+# PRESIMPLIFY_MAX_CHUNKS chunks are simplified before the upload returns
+chunk_simplifier = create_chunk_simplifier(request_chunk_simplification)
+PRESIMPLIFY_MAX_CHUNKS = int(os.getenv('PRESIMPLIFY_MAX_CHUNKS', '20'))
+
+EXCESS_NEWLINES_PATTERN = re.compile(r'\n\s*\n\s*\n+')
 
 def clean_ai_response(response):
     """Clean up AI response by removing only unnecessary meta-commentary while preserving detailed explanations"""
     if not response:
         return response
     
-    # List of phrases to remove (case-insensitive) - remove disclaimers and meta-commentary
-    phrases_to_remove = [
-        "This explanation provides a general overview. Always consult the actual legal document for precise details and requirements.",
-        "Always consult the actual legal document for precise details and requirements.",
-        "Please consult the actual legal document for precise details.",
-        "For precise details and requirements, always refer to the actual legal document.",
-        "This is a general overview. Always consult the actual document for specific requirements.",
-        "Please consult with a qualified legal professional",
-        "Please consult a qualified legal professional",
-        "Consult with a qualified legal professional",
-        "Consult a qualified legal professional",
-        "This is a general overview.",
-        "This provides a general overview.",
-        "For specific legal advice, please consult",
-        "I am not a lawyer",
-        "This is not legal advice",
-        "The document provides a complete description of the process for calculating per-case compensation",
-        "No additional information is needed from external sources to answer the question based solely on the provided text",
-        "This information is based solely on the provided document sections",
-        "A complete understanding would require access to the referenced documents"
-    ]
-    
-    cleaned_response = response
-    for phrase in phrases_to_remove:
-        # Remove the phrase and any trailing periods/spaces
-        import re
-        pattern = re.compile(re.escape(phrase) + r'\.?\s*', re.IGNORECASE)
-        cleaned_response = pattern.sub('', cleaned_response)
-    
-    # Remove markdown formatting that might appear
-    markdown_patterns = [
-        (r'\*\*(.*?)\*\*', lambda m: m.group(1).upper()),  # **bold** -> UPPERCASE
-        (r'\*(.*?)\*', lambda m: m.group(1)),              # *italic* -> plain text
-        (r'__(.*?)__', lambda m: m.group(1).upper()),      # __underline__ -> UPPERCASE  
-        (r'_(.*?)_', lambda m: m.group(1)),                # _italic_ -> plain text
-        (r'`(.*?)`', lambda m: m.group(1)),                # `code` -> plain text
-        (r'\[(.*?)\]\(.*?\)', lambda m: m.group(1)),       # [text](link) -> text only
-        (r'#{1,6}\s*', lambda m: ''),                      # ### headings -> remove hashes
-    ]
-    
-    # Apply markdown removal
-    for pattern, replacement in markdown_patterns:
-        if callable(replacement):
-            cleaned_response = re.sub(pattern, replacement, cleaned_response)
-        else:
-            cleaned_response = re.sub(pattern, replacement, cleaned_response)
+    cleaned_response = remove_disclaimers_and_markdown(response)
     
     # Clean up extra whitespace and formatting while preserving structure
-    cleaned_response = re.sub(r'\n\s*\n\s*\n+', '\n\n', cleaned_response)  # Remove excessive newlines
+    cleaned_response = EXCESS_NEWLINES_PATTERN.sub('\n\n', cleaned_response)  # Remove excessive newlines
     cleaned_response = cleaned_response.strip()
     
     return cleaned_response
 
-def query_gemini(question, text_chunks, chunks_already_simplified=False):
-    """Fast OpenRouter API query with optimized processing"""
-    if not OPENROUTER_API_KEY:
-        return "OpenRouter API not properly configured"
+# Disclaimer phrases and meta-commentary removed from answers (case-insensitive)
+DISCLAIMER_PHRASES = [
+    "This explanation provides a general overview. Always consult the actual legal document for precise details and requirements.",
+    "Always consult the actual legal document for precise details and requirements.",
+    "Please consult the actual legal document for precise details.",
+    "For precise details and requirements, always refer to the actual legal document.",
+    "This is a general overview. Always consult the actual document for specific requirements.",
+    "Please consult with a qualified legal professional",
+    "Please consult a qualified legal professional",
+    "Consult with a qualified legal professional",
+    "Consult a qualified legal professional",
+    "This is a general overview.",
+    "This provides a general overview.",
+    "For specific legal advice, please consult",
+    "I am not a lawyer",
+    "This is not legal advice",
+    "The document provides a complete description of the process for calculating per-case compensation",
+    "No additional information is needed from external sources to answer the question based solely on the provided text",
+    "This information is based solely on the provided document sections",
+    "A complete understanding would require access to the referenced documents"
+]
+
+# One pattern for all phrases, each with any trailing period/spaces; longer phrases come first
+DISCLAIMER_PATTERN = re.compile(
+    '|'.join(re.escape(phrase) + r'\.?\s*' for phrase in DISCLAIMER_PHRASES),
+    re.IGNORECASE
+)
+
+# Markdown formatting that might appear, with its plain-text replacement
+MARKDOWN_PATTERNS = [
+    (re.compile(r'\*\*(.*?)\*\*'), lambda m: m.group(1).upper()),  # **bold** -> UPPERCASE
+    (re.compile(r'\*(.*?)\*'), lambda m: m.group(1)),              # *italic* -> plain text
+    (re.compile(r'__(.*?)__'), lambda m: m.group(1).upper()),      # __underline__ -> UPPERCASE  
+    (re.compile(r'_(.*?)_'), lambda m: m.group(1)),                # _italic_ -> plain text
+    (re.compile(r'`(.*?)`'), lambda m: m.group(1)),                # `code` -> plain text
+    (re.compile(r'\[(.*?)\]\(.*?\)'), lambda m: m.group(1)),       # [text](link) -> text only
+    (re.compile(r'#{1,6}\s*'), lambda m: ''),                      # ### headings -> remove hashes
+]
+
+def remove_disclaimers_and_markdown(text):
+    """Remove disclaimer phrases and markdown formatting, leaving whitespace untouched"""
+    cleaned_response = DISCLAIMER_PATTERN.sub('', text)
     
-    try:
-        print(f"Fast processing mode: analyzing {len(text_chunks)} chunks...")
-        
-        # Fast mode: Use top relevant chunks only for speed
-        relevant_chunks = find_relevant_chunks(question, text_chunks)
-        
-        # Process top 12 most relevant chunks for detailed coverage
-        top_chunks = relevant_chunks[:12]
-        print(f"Using top {len(top_chunks)} most relevant chunks for detailed response")
-        
-        # Fast single query approach
-        combined_text = "\n\n".join(top_chunks)
-        
-        print("Sending optimized query to OpenRouter...")
-        
-        prompt = f"""You are a legal expert explaining complex legal documents to everyday people. Based on the following legal document content, provide a detailed, easy-to-understand answer.
+    # Remove markdown formatting
+    for pattern, replacement in MARKDOWN_PATTERNS:
+        cleaned_response = pattern.sub(replacement, cleaned_response)
+    
+    return cleaned_response
+
+# Start of a markdown span, and a complete span starting there (same precedence as MARKDOWN_PATTERNS)
+MARKDOWN_MARKER_PATTERN = re.compile(r'[*_`\[#]')
+MARKDOWN_SPAN_PATTERN = re.compile(r'\*\*.*?\*\*|\*(?!\*).*?\*|__.*?__|_(?!_).*?_|`.*?`|\[.*?\]\(.*?\)|#+\s*(?=\S)')
+HEADING_TAIL_PATTERN = re.compile(r'#+\s*$')
+
+LOWER_DISCLAIMER_PHRASES = [phrase.lower() for phrase in DISCLAIMER_PHRASES]
+LONGEST_DISCLAIMER_PHRASE = max(len(phrase) for phrase in DISCLAIMER_PHRASES)
+
+def releasable_length(text):
+    """
+    Length of the prefix of an unfinished line whose cleaning cannot change
+    when more text arrives: it stops before an unclosed markdown span, a
+    possible or just-completed disclaimer phrase, and trailing whitespace.
+    """
+    cut = len(text)
+    
+    position = 0
+    while True:
+        marker = MARKDOWN_MARKER_PATTERN.search(text, position)
+        if not marker:
+            break
+        span = MARKDOWN_SPAN_PATTERN.match(text, marker.start())
+        if not span:
+            cut = marker.start()
+            break
+        position = span.end()
+    
+    # The rest of the line may be the beginning of a phrase
+    text_lower = text.lower()
+    for start in range(max(len(text) - LONGEST_DISCLAIMER_PHRASE, 0), cut):
+        rest = text_lower[start:]
+        if any(phrase.startswith(rest) for phrase in LOWER_DISCLAIMER_PHRASES):
+            cut = start
+            break
+    
+    # Trailing whitespace and heading hashes absorb what follows them, and a
+    # phrase match must not be split or end the text (it may still absorb a
+    # period and spaces); moving the cut for one rule can trigger another
+    phrase_matches = list(DISCLAIMER_PATTERN.finditer(text))
+    previous = None
+    while cut != previous:
+        previous = cut
+        cut = len(HEADING_TAIL_PATTERN.sub('', text[:cut]).rstrip())
+        for match in reversed(phrase_matches):
+            if match.start() < cut and (cut < match.end() or match.end() == len(text)):
+                cut = match.start()
+    return cut
+
+class StreamingResponseCleaner:
+    """
+    Incremental version of clean_ai_response for streamed answers.
+    
+    Markdown and disclaimer patterns never span lines, so an unfinished line
+    is released as far as releasable_length allows and only a possible
+    marker is held back. Runs of blank lines are collapsed and
+    leading/trailing whitespace is dropped just as in the batch cleaner.
+    """
+    
+    def __init__(self):
+        self.pending = ''           # unreleased end of the current line
+        self.spaces = ''            # cleaned whitespace waiting for more text on the line
+        self.line_started = False   # the current line has emitted text
+        self.line_has_text = False  # the current line is not blank in the raw answer
+        self.blank_lines = 0
+        self.started = False
+    
+    def feed(self, delta):
+        """Add streamed text; returns the cleaned text that is safe to emit"""
+        self.pending += delta
+        output = []
+        while '\n' in self.pending:
+            line, self.pending = self.pending.split('\n', 1)
+            output.append(self._end_line(line))
+        
+        length = releasable_length(self.pending)
+        released, self.pending = self.pending[:length], self.pending[length:]
+        output.append(self._emit(released))
+        return ''.join(output)
+    
+    def finish(self):
+        """Flush the end of the final line"""
+        rest, self.pending = self.pending, ''
+        return self._emit(rest).rstrip()
+    
+    def _emit(self, text):
+        if text.strip():
+            self.line_has_text = True
+        cleaned = remove_disclaimers_and_markdown(text)
+        if not cleaned.strip():
+            if self.line_started:
+                self.spaces += cleaned
+            return ''
+        
+        if self.line_started:
+            separator, self.spaces = self.spaces, ''
+        elif not self.started:
+            self.started = True
+            separator = ''
+            cleaned = cleaned.lstrip()
+        else:
+            separator = '\n' * min(self.blank_lines + 1, 2)
+        self.line_started = True
+        self.blank_lines = 0
+        return separator + cleaned
+    
+    def _end_line(self, text):
+        output = self._emit(text)
+        if self.line_started:
+            output += self.spaces
+        elif not self.line_has_text:
+            # Lines emptied by phrase removal disappear; genuine blank lines separate paragraphs
+            self.blank_lines += 1
+        self.spaces = ''
+        self.line_started = False
+        self.line_has_text = False
+        return output
+
+# Phrases that mark an answer as "not found in the document"
+NOT_FOUND_PHRASES = [
+    "not available", "not specified", "does not specify", "not mentioned", 
+    "not found", "no information", "cannot determine"
+]
+
+NOT_FOUND_MESSAGE = "The specific information requested was not found in the most relevant sections of the document."
+
+def is_answer_found(answer):
+    return bool(answer) and not any(phrase in answer.lower() for phrase in NOT_FOUND_PHRASES)
+
+def build_answer_prompt(question, top_chunks):
+    """Build the question-answering prompt from the most relevant chunks"""
+    # Fast single query approach
+    combined_text = "\n\n".join(top_chunks)
+    
+    return f"""You are a legal expert explaining complex legal documents to everyday people. Based on the following legal document content, provide a detailed, easy-to-understand answer.
 
 IMPORTANT FORMATTING RULES:
 - Use CAPITAL LETTERS for headings and emphasis (not ** or markdown)
@@ -940,23 +1098,251 @@ Document Content:
 Question: {question}
 
 Provide a detailed, comprehensive answer in plain text format (no markdown):"""
+
+# Chunks sent per prompt; hybrid retrieval ranks precisely enough to send fewer
+PROMPT_TOP_K = int(os.getenv('PROMPT_TOP_K', '12'))
+HYBRID_PROMPT_TOP_K = int(os.getenv('HYBRID_PROMPT_TOP_K', '6'))
+
+def prompt_top_k(index):
+    return HYBRID_PROMPT_TOP_K if isinstance(index, HybridIndex) else PROMPT_TOP_K
+
+# Packs the ranked chunks into the prompt without overlap, within a token budget
+context_packer = create_context_packer()
+
+def select_context(question, text_chunks, index=None):
+    """Rank chunks for the question and pack the best into the context token budget; returns (passages, stats)"""
+    ranked = rank_chunks(question, text_chunks, index=index, top_k=prompt_top_k(index))
+    passages, stats = context_packer.pack(ranked, text_chunks)
+    print(f"Packed {stats['chunks_used']} chunks into {len(passages)} passages ({stats['context_tokens']} tokens)")
+    return passages, stats
+
+def query_gemini(question, text_chunks, chunks_already_simplified=False, index=None, stats=None):
+    """Fast OpenRouter API query with optimized processing; fills stats (if given) with context and prompt sizes"""
+    if not OPENROUTER_API_KEY:
+        return "OpenRouter API not properly configured"
+    
+    try:
+        print(f"Fast processing mode: analyzing {len(text_chunks)} chunks...")
         
-        response = call_openrouter_api(prompt, max_tokens=4000, temperature=0.7)
+        # Fast mode: pack the most relevant chunks into the context budget
+        passages, context_stats = select_context(question, text_chunks, index=index)
+        
+        prompt = build_answer_prompt(question, passages)
+        prompt_tokens = count_tokens(prompt)
+        print(f"Sending optimized query to OpenRouter ({prompt_tokens} prompt tokens)...")
+        if stats is not None:
+            stats.update(context_stats, prompt_tokens=prompt_tokens)
+        
+        # Identical questions on the same document share one cached answer
+        response = call_openrouter_api(prompt, max_tokens=4000, temperature=0.7, use_cache=True)
         answer = response.strip()
         
-        if answer and not any(phrase in answer.lower() for phrase in [
-            "not available", "not specified", "does not specify", "not mentioned", 
-            "not found", "no information", "cannot determine"
-        ]):
+        if is_answer_found(answer):
             print("Found answer in fast mode")
             return clean_ai_response(answer)
         else:
-            return "The specific information requested was not found in the most relevant sections of the document."
+            return NOT_FOUND_MESSAGE
     
     except Exception as e:
         print(f"Error querying OpenRouter: {e}")
         return f"Error processing question: {str(e)}. Please try again or check your API configuration."
 
+def stream_query_gemini(question, text_chunks, index=None):
+    """
+    Streaming variant of query_gemini. Yields (event, data) pairs: 'token'
+    events carry cleaned answer text as it is generated, and a final 'done'
+    (or 'error') event carries the complete answer - NOT_FOUND_MESSAGE when
+    the document does not answer the question, as query_gemini returns -
+    with chunks_used, prompt_tokens and timings.
+    """
+    start_time = time.time()
+    cleaner = StreamingResponseCleaner()
+    raw_parts = []
+    first_token_time = None
+    cache_key = None
+    
+    try:
+        passages, context_stats = select_context(question, text_chunks, index=index)
+        prompt = build_answer_prompt(question, passages)
+        prompt_tokens = count_tokens(prompt)
+        retrieval_time = time.time() - start_time
+        
+        if llm_cache is not None:
+            cache_key = llm_cache.make_key(CURRENT_MODEL, prompt, 4000, 0.7)
+            cached_response = llm_cache.get(cache_key)
+            if cached_response is not None:
+                raw_parts.append(cached_response)
+                first_token_time = time.time()
+                yield 'token', {"text": clean_ai_response(cached_response.strip())}
+        
+        if not raw_parts:
+            for delta in stream_openrouter_api(prompt, max_tokens=4000, temperature=0.7):
+                raw_parts.append(delta)
+                text = cleaner.feed(delta)
+                if text:
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    yield 'token', {"text": text}
+            
+            text = cleaner.finish()
+            if text:
+                if first_token_time is None:
+                    first_token_time = time.time()
+                yield 'token', {"text": text}
+            
+            if cache_key is not None:
+                llm_cache.set(cache_key, ''.join(raw_parts))
+    except Exception as e:
+        print(f"Error streaming answer: {e}")
+        yield 'error', {"error": f"Error processing question: {str(e)}. Please try again or check your API configuration."}
+        return
+    
+    end_time = time.time()
+    response = ''.join(raw_parts).strip()
+    answer_found = is_answer_found(response)
+    yield 'done', {
+        "success": True,
+        "answer": clean_ai_response(response) if answer_found else NOT_FOUND_MESSAGE,
+        "chunks_used": context_stats["chunks_used"],
+        "prompt_tokens": prompt_tokens,
+        "answer_found": answer_found,
+        "timings": {
+            "retrieval_ms": round(retrieval_time * 1000, 1),
+            "first_token_ms": round((first_token_time - start_time) * 1000, 1) if first_token_time else None,
+            "total_ms": round((end_time - start_time) * 1000, 1)
+        }
+    }
+
+# Question sets: questions sharing their top chunks go in one prompt, prompts run concurrently
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '4'))
+BATCH_MAX_GROUP_SIZE = int(os.getenv('BATCH_MAX_GROUP_SIZE', '5'))
+BATCH_MIN_CHUNK_OVERLAP = float(os.getenv('BATCH_MIN_CHUNK_OVERLAP', '0.5'))
+batch_llm_pool = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix='batch-llm')
+
+def build_batch_answer_prompt(questions, passages):
+    """Build one prompt answering several numbered questions from shared context"""
+    combined_text = "\n\n".join(passages)
+    question_lines = "\n".join(f"QUESTION {i}: {question}" for i, question in enumerate(questions, 1))
+    
+    return f"""You are a legal expert explaining complex legal documents to everyday people. Based on the following legal document content, answer each of the questions below in plain, easy-to-understand language.
+
+IMPORTANT FORMATTING RULES:
+- Start each answer on its own line with "ANSWER <number>:" using the number of its question
+- Answer every question, in order
+- Use CAPITAL LETTERS for emphasis and dashes (-) for lists
+- Do NOT use **, [], or other markdown formatting
+- If the document does not contain the answer to a question, say the information was not found
+
+Document Content:
+{combined_text}
+
+Questions:
+{question_lines}
+
+Answers:"""
+
+def answer_from_context(question, passages):
+    """Answer one question from packed passages; returns (answer, prompt_tokens)"""
+    prompt = build_answer_prompt(question, passages)
+    response = call_openrouter_api(prompt, max_tokens=4000, temperature=0.7, use_cache=True).strip()
+    answer = clean_ai_response(response) if is_answer_found(response) else NOT_FOUND_MESSAGE
+    return answer, count_tokens(prompt)
+
+def answer_question_group(questions, rankings, text_chunks):
+    """
+    Answer a group of questions with one prompt over their merged context.
+    Questions missing from the combined response are asked on their own.
+    Returns (answers, prompt_tokens, llm_calls).
+    """
+    if len(questions) == 1:
+        passages, _ = context_packer.pack(rankings[0], text_chunks)
+        answer, prompt_tokens = answer_from_context(questions[0], passages)
+        return [answer], prompt_tokens, 1
+    
+    passages, _ = context_packer.pack(merge_rankings(rankings), text_chunks)
+    prompt = build_batch_answer_prompt(questions, passages)
+    prompt_tokens = count_tokens(prompt)
+    response = call_openrouter_api(prompt, max_tokens=4000, temperature=0.7, use_cache=True)
+    parsed = parse_numbered_answers(response, len(questions))
+    
+    answers = []
+    llm_calls = 1
+    for number, (question, ranking) in enumerate(zip(questions, rankings), 1):
+        text = parsed.get(number)
+        if text is None:
+            print(f"Combined answer missed question {number} of {len(questions)}, asking it separately")
+            passages, _ = context_packer.pack(ranking, text_chunks)
+            answer, tokens = answer_from_context(question, passages)
+            prompt_tokens += tokens
+            llm_calls += 1
+        else:
+            answer = clean_ai_response(text) if is_answer_found(text) else NOT_FOUND_MESSAGE
+        answers.append(answer)
+    return answers, prompt_tokens, llm_calls
+
+def answer_questions_batch(questions, text_chunks, index=None):
+    """
+    Answer a set of questions on one document. Chunks are ranked for all
+    questions in one pass, questions sharing their best chunks are grouped
+    into one prompt, and the prompts run concurrently. Yields (event, data)
+    pairs: an 'answer' per question as its group completes, then 'done'.
+    """
+    start_time = time.time()
+    if index is None:
+        # Legacy callers without a cached index - build one for this request
+        index = ChunkIndex(text_chunks)
+    rankings = index.top_k_batch(questions, prompt_top_k(index))
+    groups = group_questions(rankings, min_overlap=BATCH_MIN_CHUNK_OVERLAP, max_group_size=BATCH_MAX_GROUP_SIZE)
+    retrieval_time = time.time() - start_time
+    print(f"Ranked chunks for {len(questions)} questions in {retrieval_time * 1000:.1f}ms, "
+          f"answering in {len(groups)} prompts")
+    
+    futures = {
+        batch_llm_pool.submit(answer_question_group, [questions[q] for q in group],
+                              [rankings[q] for q in group], text_chunks): group
+        for group in groups
+    }
+    prompt_tokens = 0
+    llm_calls = 0
+    failed = 0
+    first_answer_time = None
+    for future in as_completed(futures):
+        group = futures[future]
+        try:
+            answers, group_tokens, group_calls = future.result()
+            prompt_tokens += group_tokens
+            llm_calls += group_calls
+        except Exception as e:
+            print(f"Error answering question group: {e}")
+            answers = [f"Error processing question: {str(e)}. Please try again or check your API configuration."] * len(group)
+            failed += len(group)
+        
+        if first_answer_time is None:
+            first_answer_time = time.time()
+        for question_id, answer in zip(group, answers):
+            yield 'answer', {
+                "index": question_id,
+                "question": questions[question_id],
+                "answer": answer,
+                "answer_found": answer != NOT_FOUND_MESSAGE,
+                "group_size": len(group)
+            }
+    
+    end_time = time.time()
+    yield 'done', {
+        "success": failed < len(questions),
+        "questions": len(questions),
+        "failed": failed,
+        "prompts": len(groups),
+        "llm_calls": llm_calls,
+        "prompt_tokens": prompt_tokens,
+        "timings": {
+            "retrieval_ms": round(retrieval_time * 1000, 1),
+            "first_answer_ms": round((first_answer_time - start_time) * 1000, 1) if first_answer_time else None,
+            "total_ms": round((end_time - start_time) * 1000, 1)
+        }
+    }
+
 # Function removed - no longer analyzing sentiment
 
 
@@ -964,16 +1350,84 @@ Provide a detailed, comprehensive answer in plain text format (no markdown):"""
 questions_short = load_questions_short()
 
 
+def warm_up_models(model_names):
+    """Load the named models (paraphrase, ocr, qa, embeddings) so the first request doesn't pay for it"""
+    for model_name in model_names:
+        try:
+            if model_name == 'paraphrase':
+                paraphrase_module.load_model()
+            elif model_name == 'ocr' and OCR_AVAILABLE:
+                get_ocr_reader()
+            elif model_name == 'embeddings' and chunk_embedder is not None:
+                chunk_embedder.load_model()
+            elif model_name == 'qa':
+                qa_model_path = os.getenv('QA_MODEL_PATH')
+                if not qa_model_path:
+                    print("QA_MODEL_PATH not set, skipping QA model warm-up")
+                    continue
+                from predict import model_registry
+                model_registry.get(qa_model_path)
+        except Exception as e:
+            print(f"Warm-up of {model_name} model failed: {e}")
+
+# Models listed in WARMUP_MODELS load in the background; everything else loads on first use
+warmup_models = [name.strip() for name in os.getenv('WARMUP_MODELS', '').split(',') if name.strip()]
+if warmup_models:
+    threading.Thread(target=warm_up_models, args=(warmup_models,), name="model-warmup", daemon=True).start()
+
+
 
 @app.route('/')
 def index():
     """API health check endpoint"""
     return jsonify({"status": "ok", "message": "Legal AI Flask API is running", "version": "2.0"})
 
+@app.route('/ready')
+def readiness():
+    """Readiness probe - the API is usable as soon as it imports; reports which models are loaded"""
+    predict_module = sys.modules.get('predict')
+    return jsonify({
+        "ready": True,
+        "models": {
+            "paraphrase": paraphrase_module.is_model_loaded(),
+            "ocr": ocr_reader is not None if OCR_AVAILABLE else "unavailable",
+            "qa": predict_module.model_registry.loaded_models() if predict_module else [],
+            "embeddings": chunk_embedder.is_model_loaded() if chunk_embedder is not None else "disabled"
+        },
+        "warming_up": warmup_models
+    })
+
 @app.route('/questionsshort')
 def getQuestionsShort():
     return jsonify(questions_short)
 
+@app.route('/cache-stats')
+def get_cache_stats():
+    """Document cache hit/miss/eviction counters"""
+    return jsonify(pdf_cache.stats())
+
+@app.route('/http-stats')
+def get_http_stats():
+    """OpenRouter connection pool reuse and retry counters"""
+    return jsonify(openrouter_client.stats())
+
+@app.route('/simplify-stats')
+def get_simplify_stats():
+    """Concurrent chunk simplification counters"""
+    return jsonify(chunk_simplifier.stats())
+
+@app.route('/validation-stats')
+def get_validation_stats():
+    """Which validation tier decided how many documents"""
+    return jsonify(validation_cascade.stats())
+
+@app.route('/llm-cache-stats')
+def get_llm_cache_stats():
+    """LLM response cache hit/miss counters"""
+    if llm_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **llm_cache.stats()})
+
 @app.route('/models')
 def get_available_models():
     """Debug route to check available OpenRouter models"""
@@ -996,11 +1450,89 @@ def test_openrouter_api():
     print(f" Testing OpenRouter API with simple prompt...")
     
     try:
-        response = call_openrouter_api(test_prompt, max_tokens=100, temperature=0.1)
+        response = call_openrouter_api(test_prompt, max_tokens=100, temperature=0.1, use_cache=False)
         return json.dumps({"success": True, "response": response})
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
 
+def is_async_request():
+    """Uploads run as background jobs when the request asks for it (async=true in the query or form)"""
+    value = request.args.get('async') or request.form.get('async') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+def ingest_uploaded_document(file, file_type, file_hash, job=None):
+    """Extract, chunk and index one uploaded document into the cache; returns the upload response"""
+    def report_progress(pages_ingested, chunks_count):
+        if job:
+            job.update(pages_ingested=pages_ingested, chunks_count=chunks_count)
+    
+    # Stream pages through chunking and indexing; partial results are
+    # published to the cache so early pages are queryable during ingest
+    try:
+        text_content, chunks, index = ingest_pages(pdf_cache, file_hash, iter_file_pages(file, file_type),
+                                                   on_progress=report_progress)
+    except ValueError as e:
+        print(f"DEBUG: Text extraction failed: {e}")
+        pdf_cache.discard(file_hash)
+        return {
+            "error": f"Error extracting text from {file_type} file. Please ensure the file is valid and contains readable text.", 
+            "success": False
+        }
+    
+    if not text_content.strip():
+        print("DEBUG: Text content is empty after stripping")
+        pdf_cache.discard(file_hash)
+        return {"error": "File appears to be empty", "success": False}
+    
+    print(f"File content length: {len(text_content)}")
+    print(f"Created {len(chunks)} chunks")
+    
+    # Store chunks temporarily for validation
+    pdf_cache.store_chunks(file_hash, text_content, chunks, chunks, index=index)
+    
+    # Return initial success with chunk info and trigger validation
+    return {
+        "success": True,
+        "file_hash": file_hash,
+        "cached": False,
+        "chunks_count": len(chunks),
+        "text_length": len(text_content),
+        "validation_required": True,
+        "message": "Document chunked successfully. Validating document type..."
+    }
+
+def run_upload_job(job, file_content, filename, file_hash):
+    """Background job for /upload-pdf: ingest the document, then validate it"""
+    file_type = get_file_type(filename)
+    print(f"Job {job.id}: processing {file_type} file: {filename}")
+    
+    job.stage('ingesting', progress=0.0)
+    result = ingest_uploaded_document(io.BytesIO(file_content), file_type, file_hash, job=job)
+    if not result.get('success'):
+        return result
+    
+    job.stage('validating', progress=0.7)
+    cached_data = pdf_cache.lookup(file_hash) or {}
+    is_legal, confidence, doc_type, explanation, tier = validation_cascade.validate(cached_data.get('chunks', []))
+    result.update({
+        "validation_required": False,
+        "message": "Document chunked and validated",
+        "is_legal_document": bool(is_legal and confidence >= 0.6),
+        "confidence_score": round(confidence * 100, 1),
+        "document_type": doc_type,
+        "ai_explanation": explanation,
+        "validation_tier": tier
+    })
+    return result
+
+@app.route('/jobs/<job_id>')
+def get_job_status(job_id):
+    """Stage, progress, timings and result of a background ingestion job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return json.dumps({"error": "Job not found", "success": False}), 404
+    return json.dumps({"success": True, **job})
+
 @app.route('/upload-pdf', methods=["POST"])
 def upload_and_process_pdf():
     """Upload and preprocess documents (PDF, Word, Images), return file hash for subsequent questions"""
@@ -1026,12 +1558,13 @@ def upload_and_process_pdf():
         file_hash = pdf_cache.get_file_hash(file_content)
         
         # Check if already cached
-        if pdf_cache.is_cached(file_hash):
-            cached_data = pdf_cache.get_chunks(file_hash)
+        cached_data = pdf_cache.lookup(file_hash)
+        if cached_data:
             return json.dumps({
                 "success": True,
                 "file_hash": file_hash,
                 "cached": True,
+                "partial": cached_data.get('partial', False),
                 "chunks_count": len(cached_data.get('chunks', [])),
                 "processed_at": cached_data.get('processed_at', '').isoformat() if cached_data.get('processed_at') else ''
             })
@@ -1042,77 +1575,19 @@ def upload_and_process_pdf():
         # Determine file type and process accordingly
         file_type = get_file_type(file.filename)
         
-        start_time = time.time()
-        
         print(f"Processing {file_type} file: {file.filename}")
         
-        # Extract text based on file type
-        text_content = extract_text_from_file(file, file_type)
-        print(f"DEBUG: Extracted text content length: {len(text_content) if text_content else 'None'}")
-        print(f"DEBUG: First 100 chars of text: {text_content[:100] if text_content else 'None'}")
-        
-        if text_content is None:
+        # Background mode: hand the bytes to an ingestion job and return immediately
+        if is_async_request():
+            job_id = job_manager.submit('upload-pdf', run_upload_job, file_content, file.filename, file_hash)
             return json.dumps({
-                "error": f"Error extracting text from {file_type} file. Please ensure the file is valid and contains readable text.", 
-                "success": False
+                "success": True,
+                "job_id": job_id,
+                "file_hash": file_hash,
+                "status_url": url_for('get_job_status', job_id=job_id)
             })
         
-        if not text_content.strip():
-            print("DEBUG: Text content is empty after stripping")
-            return json.dumps({"error": "File appears to be empty", "success": False})
-        
-        print(f"File content length: {len(text_content)}")
-        
-        # Chunk the text first
-        chunks = chunk_text(text_content)
-        print(f"Created {len(chunks)} chunks")
-        
-        # Store chunks temporarily for validation
-        pdf_cache.store_chunks(file_hash, text_content, chunks, chunks)
-        
-        # Return initial success with chunk info and trigger validation
-        return json.dumps({
-            "success": True,
-            "file_hash": file_hash,
-            "cached": False,
-            "chunks_count": len(chunks),
-            "text_length": len(text_content),
-            "validation_required": True,
-            "message": "Document chunked successfully. Validating document type..."
-        })
-        
-        # Continue with processing - chunks already created above
-        
-        # Fast upload - minimal pre-processing for speed  
-        simplified_chunks = []
-        if OPENROUTER_API_KEY and len(chunks) <= 5:  # Only pre-simplify very small documents
-            print(f"Pre-processing {len(chunks)} chunks (small document)...")
-            for i, chunk in enumerate(chunks):
-                try:
-                    simplified_chunk = simplify_chunk_with_gemini(chunk)
-                    simplified_chunks.append(simplified_chunk)
-                    print(f"Pre-processed chunk {i+1}/{len(chunks)}")
-                except Exception as e:
-                    print(f"Error simplifying chunk {i+1}: {e}")
-                    simplified_chunks.append(chunk)
-        else:
-            print(f"Fast upload mode - using original chunks ({len(chunks)} chunks)")
-            simplified_chunks = chunks
-        
-        # Store in cache
-        pdf_cache.store_chunks(file_hash, text_content, chunks, simplified_chunks)
-        
-        processing_time = time.time() - start_time
-        
-        return json.dumps({
-            "success": True,
-            "file_hash": file_hash,
-            "cached": False,
-            "chunks_count": len(chunks),
-            "simplified_chunks_count": len(simplified_chunks),
-            "processing_time": round(processing_time, 2),
-            "text_length": len(text_content)
-        })
+        return json.dumps(ingest_uploaded_document(file, file_type, file_hash))
         
     except Exception as e:
         print(f"Error in PDF upload: {e}")
@@ -1134,19 +1609,18 @@ def validate_document():
             return json.dumps({"error": "No file hash provided", "success": False})
         
         # Check if file is cached
-        if not pdf_cache.is_cached(file_hash):
+        cached_data = pdf_cache.lookup(file_hash)
+        if not cached_data:
             return json.dumps({"error": "File not found in cache. Please upload the file again.", "success": False})
         
-        # Get cached data
-        cached_data = pdf_cache.get_chunks(file_hash)
         chunks = cached_data.get('chunks', [])
         
         if not chunks:
             return json.dumps({"error": "No chunks found for validation", "success": False})
         
-        # Validate document type using AI
-        print(" Validating document type with AI...")
-        is_legal, confidence, doc_type, explanation = validate_legal_document_with_ai(chunks)
+        # Validate document type, escalating to AI only when the local tiers are unsure
+        print(" Validating document type...")
+        is_legal, confidence, doc_type, explanation, tier = validation_cascade.validate(chunks)
         
         # Strict validation - reject if not legal or low confidence
         if not is_legal or confidence < 0.6:
@@ -1156,6 +1630,7 @@ def validate_document():
                 "confidence_score": round(confidence * 100, 1),
                 "document_type": doc_type,
                 "ai_explanation": explanation,
+                "validation_tier": tier,
                 "error": " Warning: This document does not appear to be a legal document.",
                 "suggestion": "Please upload a legal document such as contracts, agreements, legal briefs, statutes, regulations, or other legal texts for proper analysis."
             })
@@ -1169,6 +1644,7 @@ def validate_document():
             "confidence_score": round(confidence * 100, 1),
             "document_type": doc_type,
             "ai_explanation": explanation,
+            "validation_tier": tier,
             "message": f" Document validated as: {doc_type}"
         })
         
@@ -1176,6 +1652,11 @@ def validate_document():
         print(f"Error in document validation: {e}")
         return json.dumps({"error": str(e), "success": False})
 
+def format_sse(events):
+    """Serialize (event, data) pairs as server-sent events"""
+    for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/ask-question', methods=["POST"])
 def ask_question_cached():
     """Ask question using cached PDF chunks"""
@@ -1188,6 +1669,7 @@ def ask_question_cached():
         
         file_hash = data.get('file_hash', '')
         question = data.get('question', '')
+        stream = bool(data.get('stream', False))
         
         if not file_hash:
             return json.dumps({"error": "No file hash provided", "success": False})
@@ -1196,11 +1678,10 @@ def ask_question_cached():
             return json.dumps({"error": "No question provided", "success": False})
         
         # Check if file is cached
-        if not pdf_cache.is_cached(file_hash):
+        cached_data = pdf_cache.lookup(file_hash)
+        if not cached_data:
             return json.dumps({"error": "File not found in cache. Please upload the file again.", "success": False})
         
-        # Get cached data
-        cached_data = pdf_cache.get_chunks(file_hash)
         text_chunks = cached_data.get('simplified_chunks', cached_data.get('chunks', []))
         
         if not text_chunks:
@@ -1208,23 +1689,39 @@ def ask_question_cached():
         
         print(f"Processing question with {len(text_chunks)} cached chunks")
         
+        # Streaming mode: forward the answer to the client as server-sent events
+        if stream and OPENROUTER_API_KEY:
+            print("Streaming answer for cached question...")
+            events = stream_query_gemini(question, text_chunks, index=cached_data.get('index'))
+            return Response(stream_with_context(format_sse(events)), mimetype='text/event-stream',
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
         # Use OpenRouter API
         if OPENROUTER_API_KEY:
             print("Using OpenRouter API for cached question...")
             # Check if we have simplified chunks
             has_simplified_chunks = 'simplified_chunks' in cached_data and cached_data['simplified_chunks']
             print(f"Using pre-simplified chunks: {has_simplified_chunks}")
-            gemini_answer = query_gemini(question, text_chunks, chunks_already_simplified=has_simplified_chunks)
+            query_stats = {}
+            gemini_answer = query_gemini(question, text_chunks, chunks_already_simplified=has_simplified_chunks,
+                                         index=cached_data.get('index'), stats=query_stats)
             answer = [{
                 "answer": gemini_answer
             }]
             
-            return json.dumps({
+            result = {
                 "success": True,
                 "answers": answer,
                 "cached": True,
-                "chunks_used": len(text_chunks)
-            })
+                "chunks_used": len(text_chunks),
+                "context_chunks": query_stats.get("chunks_used"),
+                "prompt_tokens": query_stats.get("prompt_tokens")
+            }
+            if cached_data.get('partial'):
+                # Document still ingesting - answer covers the pages indexed so far
+                result["partial"] = True
+                result["pages_ingested"] = cached_data.get('pages_ingested', 0)
+            return json.dumps(result)
         else:
             return json.dumps({"error": "Gemini API not configured", "success": False})
             
@@ -1233,6 +1730,62 @@ def ask_question_cached():
         return json.dumps({"error": str(e), "success": False})
 
 
+@app.route('/ask-questions', methods=["POST"])
+def ask_questions_cached():
+    """Answer a set of questions (the predefined short list by default) on a cached document in one request"""
+    print("Ask questions endpoint called")
+    
+    try:
+        data = request.get_json()
+        if not data:
+            return json.dumps({"error": "No JSON data provided", "success": False})
+        
+        file_hash = data.get('file_hash', '')
+        questions = data.get('questions') or questions_short
+        stream = bool(data.get('stream', True))
+        
+        if not file_hash:
+            return json.dumps({"error": "No file hash provided", "success": False})
+        
+        if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+            return json.dumps({"error": "questions must be a list of non-empty strings", "success": False})
+        
+        cached_data = pdf_cache.lookup(file_hash)
+        if not cached_data:
+            return json.dumps({"error": "File not found in cache. Please upload the file again.", "success": False})
+        
+        text_chunks = cached_data.get('simplified_chunks', cached_data.get('chunks', []))
+        if not text_chunks:
+            return json.dumps({"error": "No chunks found for this file", "success": False})
+        
+        if not OPENROUTER_API_KEY:
+            return json.dumps({"error": "Gemini API not configured", "success": False})
+        
+        print(f"Answering {len(questions)} questions with {len(text_chunks)} cached chunks")
+        events = answer_questions_batch(questions, text_chunks, index=cached_data.get('index'))
+        
+        if stream:
+            return Response(stream_with_context(format_sse(events)), mimetype='text/event-stream',
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
+        answers = [None] * len(questions)
+        result = {}
+        for event, event_data in events:
+            if event == 'answer':
+                answers[event_data["index"]] = {"question": event_data["question"], "answer": event_data["answer"]}
+            else:
+                result = event_data
+        
+        result.update(answers=answers, cached=True, chunks_used=len(text_chunks))
+        if cached_data.get('partial'):
+            # Document still ingesting - answers cover the pages indexed so far
+            result["partial"] = True
+            result["pages_ingested"] = cached_data.get('pages_ingested', 0)
+        return json.dumps(result)
+            
+    except Exception as e:
+        print(f"Error in ask questions: {e}")
+        return json.dumps({"error": str(e), "success": False})
 
 
 @app.route('/contracts', methods=["POST"])
@@ -1315,10 +1868,12 @@ def getContractResponse():
         # Check if this is a request with cached data
         file_hash = request.form.get('file_hash', '')
         
-        if file_hash and pdf_cache.is_cached(file_hash):
+        index = None
+        cached_data = pdf_cache.lookup(file_hash) if file_hash else None
+        if cached_data:
             print("Using cached chunks for processing")
-            cached_data = pdf_cache.get_chunks(file_hash)
             text_chunks = cached_data.get('simplified_chunks', cached_data.get('chunks', []))
+            index = cached_data.get('index')
             print(f"Using {len(text_chunks)} cached chunks")
         else:
             # Chunk the text for better processing (legacy mode)
@@ -1328,8 +1883,8 @@ def getContractResponse():
         # Use Gemini API for processing
         print("Using Gemini API...")
         # Check if we're using cached simplified chunks
-        chunks_simplified = file_hash and pdf_cache.is_cached(file_hash)
-        gemini_answer = query_gemini(question, text_chunks, chunks_simplified)
+        chunks_simplified = bool(cached_data)
+        gemini_answer = query_gemini(question, text_chunks, chunks_simplified, index=index)
         answer = [{
             "answer": gemini_answer
         }]
@@ -1348,15 +1903,29 @@ def getContractResponse():
 def getContractParaphrase(selected_response):
     print(selected_response)
     
+    # Optional ?profile=fast|balanced|diverse picks the decode settings
+    profile = request.args.get('profile') or None
+    if profile is not None and profile not in PARAPHRASE_PROFILES:
+        return json.dumps({"error": f"Unknown paraphrase profile: {profile}", "success": False})
+    
     if selected_response == "":
         return "No answer found in document"
     else:
         print('getting paraphrases')
-        paraphrases = paraphrase(selected_response)
+        paraphrases = paraphrase(selected_response, profile=profile)
         print(paraphrases)
         return paraphrases
 
 
+@app.route('/contracts/paraphrase-stats', methods=['GET'])
+def getParaphraseStats():
+    """Paraphrase micro-batching and memo statistics"""
+    stats = paraphrase_batcher.stats()
+    stats["memo"] = paraphrase_memo.stats()
+    stats["profiles"] = list(PARAPHRASE_PROFILES)
+    return jsonify(stats)
+
+
 @app.route('/get_response', methods=['POST'])
 def get_response():
     question = request.form['selected_response']
@@ -1368,6 +1937,172 @@ def get_response():
     
     return "Response not found"
 
+def process_multiple_upload(files, job=None):
+    """Extract, validate and combine (filename, file) uploads into one cached document"""
+    print(f"Processing {len(files)} files...")
+    if job:
+        job.stage('extracting', progress=0.0)
+    
+    start_time = time.time()
+    combined_text = ""
+    processed_files = []
+    
+    # Extract and validate every file concurrently; the first rejected file cancels the rest
+    cancelled = threading.Event()
+    futures = {
+        upload_pool.submit(extract_and_validate_upload, filename, file, cancelled): i
+        for i, (filename, file) in enumerate(files) if filename != ''
+    }
+    results = [None] * len(files)
+    
+    for completed, future in enumerate(as_completed(futures), start=1):
+        result = future.result()
+        results[futures[future]] = result
+        if job:
+            job.update(progress=round(0.6 * completed / len(futures), 3), current_file=result and result["filename"])
+        if not result or result.get("text") is None:
+            continue
+        
+        filename = result["filename"]
+        is_legal, confidence, doc_type = result["is_legal"], result["confidence"], result["document_type"]
+        
+        # Reject if AI determines it's not a legal document with high confidence
+        if not is_legal and confidence >= 0.7:
+            print(f" Warning: {filename} does not appear to be a legal document")
+            cancelled.set()
+            for pending in futures:
+                pending.cancel()
+            return {
+                "error": f" Warning: The file '{filename}' does not appear to be a legal document.",
+                "success": False,
+                "is_legal_document": False,
+                "confidence_score": round(confidence * 100, 1),
+                "document_type": doc_type,
+                "ai_explanation": result["explanation"],
+                "validation_tier": result["validation_tier"],
+                "problematic_file": filename,
+                "suggestion": "Please ensure all uploaded files are legal documents such as contracts, agreements, legal briefs, statutes, regulations, or other legal texts for proper analysis."
+            }
+        
+        if not is_legal and confidence >= 0.5:  # Medium confidence warning but still proceed
+            print(f" Possible non-legal document: {filename} - Type: {doc_type}")
+        elif is_legal:
+            print(f" {filename} validated as legal document - Type: {doc_type}")
+        else:
+            print(f" Uncertain document type: {filename} - Type: {doc_type}, proceeding anyway")
+    
+    # Combine in upload order, with a separator per file
+    for result in results:
+        if not result or result.get("text") is None:
+            continue
+        combined_text += f"\n\n=== DOCUMENT: {result['filename']} ===\n\n"
+        combined_text += result["text"]
+        processed_files.append(result["filename"])
+    
+    if not combined_text.strip():
+        return {"error": "No readable content found in uploaded files", "success": False}
+    
+    # Generate hash for combined content
+    combined_hash = pdf_cache.get_file_hash(combined_text.encode('utf-8'))
+    
+    # Check if already cached
+    cached_data = pdf_cache.lookup(combined_hash)
+    if cached_data:
+        return {
+            "success": True,
+            "combined_hash": combined_hash,
+            "cached": True,
+            "total_chunks": len(cached_data.get('chunks', [])),
+            "files_processed": len(processed_files),
+            "processed_at": cached_data.get('processed_at', '').isoformat() if cached_data.get('processed_at') else ''
+        }
+    
+    print(f"Combined content length: {len(combined_text)}")
+    
+    # Chunk the combined text
+    if job:
+        job.stage('chunking', progress=0.6)
+    chunks = chunk_text(combined_text)
+    print(f"Created {len(chunks)} chunks from {len(processed_files)} files")
+    
+    # Fast upload - minimal pre-processing for speed  
+    if job:
+        job.stage('simplifying', progress=0.7)
+    def report_progress(done, total):
+        if job:
+            job.update(progress=round(0.7 + 0.3 * done / total, 3))
+    
+    if OPENROUTER_API_KEY and len(chunks) <= PRESIMPLIFY_MAX_CHUNKS:  # Only pre-simplify small documents
+        print(f"Pre-processing {len(chunks)} chunks (small combined document)...")
+        simplified_chunks = chunk_simplifier.simplify_all(chunks, on_progress=report_progress)
+    else:
+        print(f"Fast upload mode - using original chunks ({len(chunks)} chunks)")
+        simplified_chunks = chunks
+    
+    # Store in cache
+    pdf_cache.store_chunks(combined_hash, combined_text, chunks, simplified_chunks)
+    
+    processing_time = time.time() - start_time
+    
+    return {
+        "success": True,
+        "combined_hash": combined_hash,
+        "cached": False,
+        "total_chunks": len(chunks),
+        "files_processed": len(processed_files),
+        "processing_time": round(processing_time, 2),
+        "total_text_length": len(combined_text),
+        "processed_files": processed_files
+    }
+
+def extract_and_validate_upload(filename, file, cancelled):
+    """
+    Per-file work for /upload-multiple, run on the upload I/O pool: PDFs with
+    at least PDF_PARALLEL_MIN_PAGES pages are parsed on the extraction process
+    pool, everything else (including OCR and the validation call) runs here.
+    Returns None when cancelled and text None when the file has no usable text.
+    """
+    if cancelled.is_set():
+        return None
+    
+    print(f"Processing file: {filename}")
+    
+    # Determine file type and extract text
+    file_type = get_file_type(filename)
+    text_content = extract_text_from_file(file, file_type)
+    
+    if text_content is None:
+        print(f"Warning: Could not extract text from {filename}")
+        return {"filename": filename, "text": None}
+    
+    if not text_content.strip():
+        print(f"Warning: {filename} appears to be empty")
+        return {"filename": filename, "text": None}
+    
+    if cancelled.is_set():
+        return None
+    
+    # Chunk the text first for better analysis
+    file_chunks = chunk_text(text_content)
+    
+    # Validate if the document is a legal document (local tiers first, AI for uncertain documents)
+    print(f" Validating {filename}...")
+    is_legal, confidence, doc_type, explanation, tier = validation_cascade.validate(file_chunks)
+    
+    return {
+        "filename": filename,
+        "text": text_content,
+        "is_legal": is_legal,
+        "confidence": confidence,
+        "document_type": doc_type,
+        "explanation": explanation,
+        "validation_tier": tier
+    }
+
+def run_multiple_upload_job(job, uploads):
+    """Background job for /upload-multiple; uploads is a list of (filename, bytes)"""
+    return process_multiple_upload([(filename, io.BytesIO(content)) for filename, content in uploads], job=job)
+
 @app.route('/upload-multiple', methods=["POST"])
 def upload_and_process_multiple():
     """Upload and process multiple documents, return combined hash for subsequent questions"""
@@ -1383,123 +2118,17 @@ def upload_and_process_multiple():
         if not files or len(files) == 0:
             return json.dumps({"error": "No files selected", "success": False})
             
-        print(f"Processing {len(files)} files...")
-        
-        start_time = time.time()
-        combined_text = ""
-        processed_files = []
-        total_chunks = []
-        
-        # Process each file
-        for file in files:
-            if file.filename == '':
-                continue
-                
-            print(f"Processing file: {file.filename}")
-            
-            # Determine file type and extract text
-            file_type = get_file_type(file.filename)
-            text_content = extract_text_from_file(file, file_type)
-            
-            if text_content is None:
-                print(f"Warning: Could not extract text from {file.filename}")
-                continue
-                
-            if not text_content.strip():
-                print(f"Warning: {file.filename} appears to be empty")
-                continue
-                
-            # Chunk the text first for better analysis
-            file_chunks = chunk_text(text_content)
-            
-            # Validate if the document is a legal document using AI
-            print(f" Validating {file.filename} with AI...")
-            is_legal, confidence, doc_type, explanation = validate_legal_document_with_ai(file_chunks)
-            
-            # Reject if AI determines it's not a legal document with high confidence
-            if not is_legal and confidence >= 0.7:
-                print(f" Warning: {file.filename} does not appear to be a legal document")
-                return json.dumps({
-                    "error": f" Warning: The file '{file.filename}' does not appear to be a legal document.",
-                    "success": False,
-                    "is_legal_document": False,
-                    "confidence_score": round(confidence * 100, 1),
-                    "document_type": doc_type,
-                    "ai_explanation": explanation,
-                    "problematic_file": file.filename,
-                    "suggestion": "Please ensure all uploaded files are legal documents such as contracts, agreements, legal briefs, statutes, regulations, or other legal texts for proper analysis."
-                })
-            
-            if not is_legal and confidence >= 0.5:  # Medium confidence warning but still proceed
-                print(f" Possible non-legal document: {file.filename} - Type: {doc_type}")
-            elif is_legal:
-                print(f" {file.filename} validated as legal document - Type: {doc_type}")
-            else:
-                print(f" Uncertain document type: {file.filename} - Type: {doc_type}, proceeding anyway")
-                
-            # Add file separator and combine text
-            combined_text += f"\n\n=== DOCUMENT: {file.filename} ===\n\n"
-            combined_text += text_content
-            processed_files.append(file.filename)
-            
-            # Reset file pointer for next operations
-            file.seek(0)
-        
-        if not combined_text.strip():
-            return json.dumps({"error": "No readable content found in uploaded files", "success": False})
-        
-        # Generate hash for combined content
-        combined_hash = pdf_cache.get_file_hash(combined_text.encode('utf-8'))
-        
-        # Check if already cached
-        if pdf_cache.is_cached(combined_hash):
-            cached_data = pdf_cache.get_chunks(combined_hash)
+        # Background mode: read the files now (request streams close with the request)
+        if is_async_request():
+            uploads = [(file.filename, file.read()) for file in files if file.filename != '']
+            job_id = job_manager.submit('upload-multiple', run_multiple_upload_job, uploads)
             return json.dumps({
                 "success": True,
-                "combined_hash": combined_hash,
-                "cached": True,
-                "total_chunks": len(cached_data.get('chunks', [])),
-                "files_processed": len(processed_files),
-                "processed_at": cached_data.get('processed_at', '').isoformat() if cached_data.get('processed_at') else ''
+                "job_id": job_id,
+                "status_url": url_for('get_job_status', job_id=job_id)
             })
         
-        print(f"Combined content length: {len(combined_text)}")
-        
-        # Chunk the combined text
-        chunks = chunk_text(combined_text)
-        print(f"Created {len(chunks)} chunks from {len(processed_files)} files")
-        
-        # Fast upload - minimal pre-processing for speed  
-        simplified_chunks = []
-        if OPENROUTER_API_KEY and len(chunks) <= 10:  # Only pre-simplify small documents
-            print(f"Pre-processing {len(chunks)} chunks (small combined document)...")
-            for i, chunk in enumerate(chunks):
-                try:
-                    simplified_chunk = simplify_chunk_with_gemini(chunk)
-                    simplified_chunks.append(simplified_chunk)
-                    print(f"Pre-processed chunk {i+1}/{len(chunks)}")
-                except Exception as e:
-                    print(f"Error simplifying chunk {i+1}: {e}")
-                    simplified_chunks.append(chunk)
-        else:
-            print(f"Fast upload mode - using original chunks ({len(chunks)} chunks)")
-            simplified_chunks = chunks
-        
-        # Store in cache
-        pdf_cache.store_chunks(combined_hash, combined_text, chunks, simplified_chunks)
-        
-        processing_time = time.time() - start_time
-        
-        return json.dumps({
-            "success": True,
-            "combined_hash": combined_hash,
-            "cached": False,
-            "total_chunks": len(chunks),
-            "files_processed": len(processed_files),
-            "processing_time": round(processing_time, 2),
-            "total_text_length": len(combined_text),
-            "processed_files": processed_files
-        })
+        return json.dumps(process_multiple_upload([(file.filename, file) for file in files]))
         
     except Exception as e:
         print(f"Error in multiple files upload: {e}")
@@ -0,0 +1,70 @@
+"""
+Compare PDF extraction backends on the same files.
+
+Usage (from flask_server/):
+    python benchmarks/pdf_extraction.py filing1.pdf filing2.pdf --repeat 3 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_extractors
+from pdf_extractors import EXTRACTORS, PDFIUM_AVAILABLE, extract_pdf_pages, get_extractor
+
+
+def reset_pool():
+    """The process pool is sized on first use, so start each worker count with a fresh one"""
+    if pdf_extractors.process_pool is not None:
+        pdf_extractors.process_pool.shutdown()
+        pdf_extractors.process_pool = None
+
+
+def run(path, extractor_name, workers, repeat):
+    with open(path, 'rb') as f:
+        data = f.read()
+    extractor = get_extractor(extractor_name)
+
+    timings = []
+    pages = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = extract_pdf_pages(data, extractor, workers=workers, parallel_min_pages=1 if workers > 1 else 10 ** 9)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    chars = sum(len(page) for page in pages)
+    return {
+        "file": os.path.basename(path),
+        "backend": extractor.name,
+        "workers": workers,
+        "pages": len(pages),
+        "chars": chars,
+        "best_s": best,
+        "pages_per_s": len(pages) / best if best else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='PDF files to extract')
+    parser.add_argument('--backends', nargs='+', default=list(EXTRACTORS.keys()))
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    backends = [name for name in args.backends if name != 'pdfium' or PDFIUM_AVAILABLE]
+    print(f"{'file':30} {'backend':8} {'workers':>7} {'pages':>6} {'chars':>9} {'best s':>8} {'pages/s':>8}")
+    for path in args.files:
+        for backend in backends:
+            for workers in args.workers:
+                reset_pool()
+                r = run(path, backend, workers, args.repeat)
+                print(f"{r['file'][:30]:30} {r['backend']:8} {r['workers']:>7} {r['pages']:>6} "
+                      f"{r['chars']:>9} {r['best_s']:>8.3f} {r['pages_per_s']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare QA inference backends against the FP32 PyTorch baseline.
+
+Runs every question in data/questions.txt against every data/contract-*.txt
+with each backend and reports load time, latency per contract, throughput
+and how often the answers agree with the torch backend.
+
+Usage (from flask_server/):
+    python benchmarks/qa_backends.py --model path/to/qa-model --backends torch torch-int8 onnx onnx-int8
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers.data.metrics.squad_metrics import compute_f1
+
+from predict import ONNXRUNTIME_AVAILABLE, QA_BACKENDS, model_registry, run_prediction
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_questions(path, limit=None):
+    """Questions from a "Question N: text" file"""
+    with open(path, encoding='utf-8') as f:
+        questions = [line.split(':', 1)[1].strip() for line in f if ':' in line]
+    return questions[:limit] if limit else questions
+
+
+def run(backend, model_path, contracts, questions, repeat, batch_size):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_registry.get(model_path, backend)
+        # Untimed pass so lazy initialisation and the document encodings are not measured
+        run_prediction(questions[:1], contracts[0][1], model_path, 1, backend=backend, batch_size=batch_size)
+    load_s = time.perf_counter() - start
+
+    answers = {}
+    latencies = []
+    for name, context in contracts:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                predictions = run_prediction(questions, context, model_path, 1, backend=backend,
+                                             batch_size=batch_size)
+            timings.append(time.perf_counter() - start)
+        latencies.append(min(timings))
+        for qas_id, answer in predictions.items():
+            answers[(name, qas_id)] = answer
+    return load_s, latencies, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('QA_MODEL_PATH'), help='QA model path (default QA_MODEL_PATH)')
+    parser.add_argument('--backends', nargs='+', default=list(QA_BACKENDS), choices=QA_BACKENDS)
+    parser.add_argument('--contracts', default=os.path.join(DATA_DIR, 'contract-*.txt'))
+    parser.add_argument('--questions', default=os.path.join(DATA_DIR, 'questions.txt'))
+    parser.add_argument('--limit', type=int, default=None, help='only the first N questions')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=None, help='features per forward pass (default QA_BATCH_SIZE)')
+    args = parser.parse_args()
+    if not args.model:
+        parser.error('--model or QA_MODEL_PATH is required')
+
+    contracts = []
+    for path in sorted(glob.glob(args.contracts)):
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            contracts.append((os.path.basename(path), f.read()))
+    questions = load_questions(args.questions, args.limit)
+
+    # The baseline is always measured first; keep every backend resident
+    backends = ['torch'] + [name for name in args.backends if name != 'torch']
+    backends = [name for name in backends if not name.startswith('onnx') or ONNXRUNTIME_AVAILABLE]
+    model_registry.max_models = len(backends)
+
+    print(f"{len(contracts)} contracts x {len(questions)} questions, best of {args.repeat}")
+    print(f"{'backend':10} {'load s':>8} {'s/contract':>10} {'questions/s':>11} {'exact %':>8} {'F1 %':>6}")
+    baseline = None
+    for backend in backends:
+        load_s, latencies, answers = run(backend, args.model, contracts, questions, args.repeat, args.batch_size)
+        if baseline is None:
+            baseline = answers
+        exact = sum(answers[key] == baseline[key] for key in baseline) / len(baseline)
+        f1 = sum(compute_f1(baseline[key], answers[key]) for key in baseline) / len(baseline)
+        mean_latency = sum(latencies) / len(latencies)
+        throughput = len(questions) * len(latencies) / sum(latencies)
+        print(f"{backend:10} {load_s:>8.2f} {mean_latency:>10.3f} {throughput:>11.1f} "
+              f"{exact * 100:>8.1f} {f1 * 100:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
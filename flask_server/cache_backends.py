@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from entry_codec import decode_entry, encode_entry
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+def estimate_size(obj, seen=None):
+    """
+    Deep size in bytes of a cache entry. Objects referenced more than once
+    (e.g. simplified_chunks pointing at the chunks list) are counted once.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key, seen) + estimate_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, seen)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), seen)
+    return size
+
+
+class CacheBackend:
+    """Storage interface behind PDFCache - entries are plain dicts keyed by file hash"""
+
+    name = 'base'
+    evictions = 0
+
+    def get(self, key):
+        """Return the stored entry or None"""
+        raise NotImplementedError
+
+    def set(self, key, entry, ttl_seconds=None):
+        """Store an entry, replacing any previous one"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove an entry if present"""
+        raise NotImplementedError
+
+    def keys(self):
+        """List all stored keys"""
+        raise NotImplementedError
+
+    def delete_expired(self):
+        """Drop entries whose TTL has passed; returns the number removed"""
+        return 0
+
+    def size_bytes(self):
+        """Bytes held by this process for cached entries"""
+        return 0
+
+    def _decode(self, key, value):
+        """Decode a stored value; anything not written by encode_entry (e.g. an old pickle) is a miss"""
+        try:
+            return decode_entry(value)
+        except Exception as e:
+            print(f"Ignoring unreadable {self.name} cache entry {key}: {e}")
+            return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Per-process storage with LRU eviction against a byte budget
+    (max_bytes, 0 or None for unbounded).
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=None):
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.expires_at = {}
+        self.total_bytes = 0
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key):
+        self.entries.pop(key, None)
+        self.expires_at.pop(key, None)
+        self.total_bytes -= self.sizes.pop(key, 0)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at = self.expires_at.get(key)
+            if expires_at is not None and expires_at < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl_seconds=None):
+        size = estimate_size(entry)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.sizes[key] = size
+            self.total_bytes += size
+            if ttl_seconds:
+                self.expires_at[key] = time.time() + ttl_seconds
+
+            # Evict least recently used entries, never the one just stored
+            while self.max_bytes and self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                oldest_key = next(iter(self.entries))
+                print(f"Cache evicting {oldest_key} ({self.sizes[oldest_key]} bytes)")
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def keys(self):
+        with self.lock:
+            return list(self.entries.keys())
+
+    def delete_expired(self):
+        now = time.time()
+        with self.lock:
+            expired_keys = [key for key, expires_at in self.expires_at.items() if expires_at < now]
+            for key in expired_keys:
+                self._remove(key)
+        return len(expired_keys)
+
+    def size_bytes(self):
+        with self.lock:
+            return self.total_bytes
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    On-disk storage in a WAL-mode SQLite file, shared by every worker
+    process on the host and kept across restarts. Values are stored with
+    encode_entry, never pickled.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL, expires_at REAL)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread - sqlite3 connections must not be shared across threads"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return self._decode(key, value)
+
+    def set(self, key, entry, ttl_seconds=None):
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, sqlite3.Binary(encode_entry(entry)), now, expires_at)
+        )
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        conn.commit()
+
+    def keys(self):
+        rows = self._connection().execute("SELECT key FROM cache_entries").fetchall()
+        return [row[0] for row in rows]
+
+    def delete_expired(self):
+        conn = self._connection()
+        cursor = conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Storage on a Redis-protocol server (Redis, KeyDB, Valkey...) so every
+    worker on every node shares one document cache. Expiry is delegated to
+    the server through key TTLs and the size bound to its maxmemory-policy.
+    The server may be shared, so values are stored with encode_entry rather
+    than pickle and reading them cannot execute code.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, key_prefix='doculix:pdf:'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package not installed, cannot use the redis cache backend")
+        self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        if value is None:
+            return None
+        return self._decode(key, value)
+
+    def set(self, key, entry, ttl_seconds=None):
+        self.client.set(self.key_prefix + key, encode_entry(entry), ex=int(ttl_seconds) if ttl_seconds else None)
+
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key)
+
+    def keys(self):
+        prefix_length = len(self.key_prefix)
+        return [
+            key.decode('utf-8')[prefix_length:]
+            for key in self.client.scan_iter(match=self.key_prefix + '*')
+        ]
+
+
+def create_cache_backend(backend_name=None):
+    """
+    Create the cache backend selected by the PDF_CACHE_BACKEND env var
+    (memory, sqlite or redis). Falls back to memory if the backend can't start.
+    The in-memory byte budget comes from PDF_CACHE_MAX_BYTES.
+    """
+    backend_name = (backend_name or os.getenv('PDF_CACHE_BACKEND', 'memory')).lower()
+    max_bytes = int(os.getenv('PDF_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+    try:
+        if backend_name == 'sqlite':
+            path = os.getenv('PDF_CACHE_SQLITE_PATH', os.path.join('cache', 'pdf_cache.sqlite3'))
+            return SQLiteCacheBackend(path)
+        if backend_name == 'redis':
+            url = os.getenv('PDF_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+            return RedisCacheBackend(url)
+    except Exception as e:
+        print(f"Failed to start {backend_name} cache backend: {e}, falling back to in-memory cache")
+        return MemoryCacheBackend(max_bytes)
+
+    if backend_name != 'memory':
+        print(f"Unknown cache backend '{backend_name}', using in-memory cache")
+    return MemoryCacheBackend(max_bytes)
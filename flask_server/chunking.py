@@ -0,0 +1,184 @@
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+SENTENCE_END_PATTERN = re.compile(r'\.')
+
+# Large-document mode (the default) chunks the whole text; otherwise only
+# the first MAX_CHUNKS chunks are kept, as the app originally did for speed
+LARGE_DOCUMENT_MODE = os.getenv('LARGE_DOCUMENT_MODE', 'true').lower() in ('1', 'true', 'yes')
+DEFAULT_MAX_CHUNKS = None if LARGE_DOCUMENT_MODE else int(os.getenv('MAX_CHUNKS', '20'))
+
+
+class ChunkView(Sequence):
+    """
+    Chunks of a document as (start, end) spans into its text. Chunks are
+    sliced out on access, so a cached document holds its text once instead
+    of the text plus overlapping copies of every chunk.
+    """
+
+    def __init__(self, text, starts, ends):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.text[start:end] for start, end in zip(self.starts[i], self.ends[i])]
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def spans(self):
+        return list(zip(self.starts, self.ends))
+
+    def __repr__(self):
+        return f"ChunkView({len(self)} chunks over {len(self.text)} chars)"
+
+
+class PageBuffer:
+    """
+    Text of a document that is still being ingested, held as its pages.
+    Supports len() and slicing like a string, so a ChunkView can read chunks
+    from it before the pages are joined into one string. Pages are only
+    appended, so views over the chunks found so far stay valid.
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.offsets = array('q')  # absolute offset of each page
+        self.length = 0
+
+    def append(self, page):
+        self.offsets.append(self.length)
+        self.pages.append(page)
+        self.length += len(page)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("PageBuffer only supports contiguous slices")
+        start, stop, _ = key.indices(self.length)
+        parts = []
+        i = max(bisect_right(self.offsets, start) - 1, 0)
+        while i < len(self.pages) and self.offsets[i] < stop:
+            page_start = self.offsets[i]
+            parts.append(self.pages[i][max(start - page_start, 0):stop - page_start])
+            i += 1
+        return ''.join(parts)
+
+    def join(self):
+        return ''.join(self.pages)
+
+
+class Chunker:
+    """
+    The chunker for every upload path. Text can be fed in one piece or page
+    by page; chunks become final as soon as text exists past their end and
+    are recorded as (start, end) spans into the concatenated text, carrying
+    the overlap across page boundaries. Sentence ends are located with one
+    scan per fed piece and looked up by bisection, and only the text from
+    the current chunk start onwards is buffered.
+    """
+
+    def __init__(self, chunk_size=3000, overlap=300, max_chunks=DEFAULT_MAX_CHUNKS):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_chunks = max_chunks
+        self.buffer = ''
+        self.buffer_start = 0  # absolute offset of buffer[0]
+        self.start = 0         # absolute offset of the next chunk
+        self.total_length = 0
+        self.sentence_ends = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def done(self):
+        return self.max_chunks is not None and len(self.starts) >= self.max_chunks
+
+    def feed(self, text):
+        """Add text; returns the spans of the chunks that became final"""
+        if self.done():
+            self.total_length += len(text)
+            return []
+
+        # Drop text no future chunk can start in (kept until now so the spans
+        # returned by the previous feed stay readable through text_of)
+        drop = self.start - self.buffer_start
+        if drop > 0:
+            self.buffer = self.buffer[drop:]
+            self.buffer_start = self.start
+            del self.sentence_ends[:bisect_left(self.sentence_ends, self.start)]
+
+        offset = self.total_length
+        self.sentence_ends.extend(offset + match.start() for match in SENTENCE_END_PATTERN.finditer(text))
+        self.buffer += text
+        self.total_length += len(text)
+
+        spans = []
+        # A chunk is final once text exists past its end
+        while not self.done() and self.total_length > self.start + self.chunk_size:
+            spans.append(self._next_span(more_text_follows=True))
+        return spans
+
+    def finish(self):
+        """Returns the spans of the remaining chunks once all text has been fed"""
+        if not self.starts and self.total_length <= self.chunk_size:
+            # Short documents are a single unstripped chunk
+            self.starts.append(0)
+            self.ends.append(self.total_length)
+            return [(0, self.total_length)]
+
+        spans = []
+        while not self.done() and self.start < self.total_length:
+            more_text_follows = self.start + self.chunk_size < self.total_length
+            spans.append(self._next_span(more_text_follows))
+            if self.start >= self.total_length:
+                break
+        return spans
+
+    def text_of(self, span):
+        """Text of a span returned by the latest feed or finish"""
+        start, end = span
+        return self.buffer[start - self.buffer_start:end - self.buffer_start]
+
+    def view(self, text):
+        """ChunkView of all chunks over the complete fed text"""
+        return ChunkView(text, self.starts, self.ends)
+
+    def _next_span(self, more_text_follows):
+        start = self.start
+        end = start + self.chunk_size
+
+        # Try to end chunk at a sentence boundary in the last 30% of the chunk
+        if more_text_follows:
+            i = bisect_left(self.sentence_ends, end) - 1
+            if i >= 0 and self.sentence_ends[i] - start > self.chunk_size * 0.7:
+                end = self.sentence_ends[i] + 1
+
+        self.start = end - self.overlap
+
+        # Strip surrounding whitespace by moving the span, not by copying
+        chunk_start, chunk_end = start, min(end, self.total_length)
+        buffer, base = self.buffer, self.buffer_start
+        while chunk_start < chunk_end and buffer[chunk_start - base].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and buffer[chunk_end - 1 - base].isspace():
+            chunk_end -= 1
+
+        self.starts.append(chunk_start)
+        self.ends.append(chunk_end)
+        return chunk_start, chunk_end
+
+
+def chunk_text(text, chunk_size=3000, overlap=300, max_chunks=DEFAULT_MAX_CHUNKS):
+    """Split text into overlapping chunks, returned as a ChunkView over text"""
+    chunker = Chunker(chunk_size, overlap, max_chunks)
+    chunker.feed(text)
+    chunker.finish()
+    return chunker.view(text)
@@ -0,0 +1,124 @@
+import os
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Without tiktoken, estimate one token per four characters of English text
+CHARS_PER_TOKEN = 4
+
+token_encoding = None
+
+
+def count_tokens(text):
+    """Token count of text (cl100k_base with tiktoken, otherwise a character estimate)"""
+    global token_encoding, TIKTOKEN_AVAILABLE
+    if TIKTOKEN_AVAILABLE and token_encoding is None:
+        try:
+            token_encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            # The encoding file is downloaded on first use, which fails offline
+            print(f"tiktoken encoding unavailable, estimating token counts: {e}")
+            TIKTOKEN_AVAILABLE = False
+    if TIKTOKEN_AVAILABLE:
+        return len(token_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def subtract_intervals(start, end, taken):
+    """Parts of [start, end) not covered by the sorted, disjoint intervals in taken"""
+    parts = []
+    for taken_start, taken_end in taken:
+        if taken_end <= start:
+            continue
+        if taken_start >= end:
+            break
+        if taken_start > start:
+            parts.append((start, taken_start))
+        start = max(start, taken_end)
+    if start < end:
+        parts.append((start, end))
+    return parts
+
+
+def merge_intervals(intervals):
+    """Merge sorted intervals that overlap or touch"""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class ContextPacker:
+    """
+    Packs the best-ranked chunks into a prompt context under a token budget.
+
+    Candidates are taken greedily by score, skipping any scoring below
+    min_score_ratio of the best one. When chunks are spans into the document
+    (a ChunkView) only text not already selected is added, and overlapping
+    or adjacent selections are merged into passages in document order.
+    """
+
+    def __init__(self, token_budget=6000, min_score_ratio=0.25):
+        self.token_budget = token_budget
+        self.min_score_ratio = min_score_ratio
+
+    def pack(self, ranked, chunks):
+        """
+        ranked is [(score, chunk_id)] best first. Returns (passages, stats);
+        stats has chunks_used, context_tokens and chunks_skipped.
+        """
+        if not ranked:
+            return [], {"chunks_used": 0, "context_tokens": 0, "chunks_skipped": 0}
+
+        cutoff = ranked[0][0] * self.min_score_ratio if ranked[0][0] > 0 else None
+        spans = hasattr(chunks, 'starts')
+        taken = []
+        selected = []
+        used_tokens = 0
+        skipped = 0
+
+        for score, chunk_id in ranked:
+            if cutoff is not None and score < cutoff:
+                skipped += 1
+                continue
+
+            if spans:
+                new_parts = subtract_intervals(chunks.starts[chunk_id], chunks.ends[chunk_id], taken)
+                cost = sum(count_tokens(chunks.text[start:end]) for start, end in new_parts)
+            else:
+                new_parts = None
+                cost = count_tokens(chunks[chunk_id])
+
+            if used_tokens + cost > self.token_budget:
+                skipped += 1
+                continue
+
+            used_tokens += cost
+            selected.append(chunk_id)
+            if spans:
+                taken = merge_intervals(sorted(taken + new_parts))
+
+        if spans:
+            passages = [chunks.text[start:end].strip() for start, end in merge_intervals(taken)]
+        else:
+            passages = [chunks[chunk_id] for chunk_id in selected]
+
+        return passages, {
+            "chunks_used": len(selected),
+            "context_tokens": used_tokens,
+            "chunks_skipped": skipped
+        }
+
+
+def create_context_packer():
+    """ContextPacker configured from CONTEXT_TOKEN_BUDGET and CONTEXT_MIN_SCORE_RATIO"""
+    return ContextPacker(
+        token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', '6000')),
+        min_score_ratio=float(os.getenv('CONTEXT_MIN_SCORE_RATIO', '0.25'))
+    )
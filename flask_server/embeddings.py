@@ -0,0 +1,213 @@
+import heapq
+import importlib.util
+import os
+import threading
+import time
+
+import numpy as np
+
+# sentence-transformers (and torch) are only imported when the model is loaded
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Reciprocal rank fusion constant; larger values flatten the rank curve
+RRF_K = 60
+
+
+class EmbeddingMatrix:
+    """
+    Unit-normalised chunk embeddings as one contiguous matrix, either float32
+    or int8 with a per-row scale (4x smaller). Question similarity is a
+    single matrix-vector product.
+    """
+
+    def __init__(self, vectors, quantize=False):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.quantized = quantize
+        if quantize:
+            self.scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12).astype(np.float32) / 127.0
+            self.vectors = np.ascontiguousarray(np.round(vectors / self.scales[:, None]).astype(np.int8))
+        else:
+            self.scales = None
+            self.vectors = vectors
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def similarities(self, query):
+        """Cosine similarity of every chunk to a unit-normalised query vector"""
+        if self.quantized:
+            scales = self.scales if query.ndim == 1 else self.scales[:, None]
+            return (self.vectors @ query) * scales
+        return self.vectors @ query
+
+    def top_k(self, query, k):
+        """Return [(similarity, chunk_id)] for the k most similar chunks, best first"""
+        return self._rank(self.similarities(query), k)
+
+    def top_k_batch(self, queries, k):
+        """top_k for a matrix of query vectors (one per row) with a single matrix product"""
+        similarities = self.similarities(np.ascontiguousarray(queries.T))
+        return [self._rank(similarities[:, q], k) for q in range(similarities.shape[1])]
+
+    @staticmethod
+    def _rank(similarities, k):
+        if k < len(similarities):
+            candidates = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            candidates = np.arange(len(similarities))
+        ordered = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        return [(float(similarities[i]), int(i)) for i in ordered]
+
+
+class ChunkEmbedder:
+    """
+    Small local CPU sentence-embedding model. Chunks longer than the model's
+    input window are embedded as passage_chars-sized passages whose vectors
+    are averaged, so the whole chunk contributes.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, passage_chars=1000, batch_size=32, quantize=False):
+        self.model_name = model_name
+        self.passage_chars = passage_chars
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.model = None
+        self.model_lock = threading.Lock()
+
+    def load_model(self):
+        with self.model_lock:
+            if self.model is None:
+                start_time = time.time()
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(self.model_name, device='cpu')
+                print(f"Loaded embedding model {self.model_name} in {time.time() - start_time:.2f}s")
+        return self.model
+
+    def is_model_loaded(self):
+        return self.model is not None
+
+    def embed_texts(self, texts):
+        vectors = self.load_model().encode(
+            list(texts), batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return vectors.astype(np.float32, copy=False)
+
+    def embed_query(self, question):
+        return self.embed_texts([question])[0]
+
+    def embed_chunks(self, chunks):
+        """Embed every chunk once; returns an EmbeddingMatrix with one row per chunk"""
+        start_time = time.time()
+        passages = []
+        owners = []
+        for chunk_id, chunk in enumerate(chunks):
+            for start in range(0, max(len(chunk), 1), self.passage_chars):
+                passages.append(chunk[start:start + self.passage_chars])
+                owners.append(chunk_id)
+
+        passage_vectors = self.embed_texts(passages)
+        vectors = np.zeros((len(chunks), passage_vectors.shape[1]), dtype=np.float32)
+        np.add.at(vectors, np.asarray(owners), passage_vectors)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        matrix = EmbeddingMatrix(vectors, quantize=self.quantize)
+        print(f"Embedded {len(chunks)} chunks ({len(passages)} passages, {matrix.nbytes} bytes) "
+              f"in {time.time() - start_time:.2f}s")
+        return matrix
+
+
+class HybridIndex:
+    """
+    Lexical index plus chunk embeddings. Each side proposes its best
+    candidates and the rankings are combined with weighted reciprocal rank
+    fusion. Offers the same top_k as ChunkIndex.
+    """
+
+    def __init__(self, lexical_index, embeddings, model_name, embedding_weight=0.5, candidates=30):
+        self.lexical_index = lexical_index
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.embedding_weight = embedding_weight
+        self.candidates = candidates
+
+    @property
+    def num_chunks(self):
+        return self.lexical_index.num_chunks
+
+    def top_k(self, question, k):
+        embedder = chunk_embedder
+        if embedder is None or embedder.model_name != self.model_name:
+            # Embedded with a model that is no longer configured - lexical only
+            return self.lexical_index.top_k(question, k)
+
+        candidates = max(k, self.candidates)
+        lexical = self.lexical_index.top_k(question, candidates)
+        try:
+            semantic = self.embeddings.top_k(embedder.embed_query(question), candidates)
+        except Exception as e:
+            print(f"Question embedding failed, using lexical ranking: {e}")
+            return lexical[:k]
+
+        return self._fuse(lexical, semantic, k)
+
+    def top_k_batch(self, questions, k):
+        """Lexical batch ranking plus all question embeddings in one encode and one matrix product"""
+        embedder = chunk_embedder
+        candidates = max(k, self.candidates)
+        lexical = self.lexical_index.top_k_batch(questions, candidates)
+        if embedder is None or embedder.model_name != self.model_name:
+            return [ranking[:k] for ranking in lexical]
+        try:
+            semantic = self.embeddings.top_k_batch(embedder.embed_texts(questions), candidates)
+        except Exception as e:
+            print(f"Question embedding failed, using lexical ranking: {e}")
+            return [ranking[:k] for ranking in lexical]
+        return [self._fuse(lex, sem, k) for lex, sem in zip(lexical, semantic)]
+
+    def _fuse(self, lexical, semantic, k):
+        fused = {}
+        for weight, ranking in ((1 - self.embedding_weight, lexical), (self.embedding_weight, semantic)):
+            for rank, (_, chunk_id) in enumerate(ranking):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (RRF_K + rank + 1)
+
+        return heapq.nlargest(k, ((score, chunk_id) for chunk_id, score in fused.items()),
+                              key=lambda item: (item[0], -item[1]))
+
+
+def create_chunk_embedder():
+    """
+    ChunkEmbedder when EMBEDDING_RETRIEVAL is enabled and sentence-transformers
+    is installed, otherwise None (retrieval stays lexical)
+    """
+    if os.getenv('EMBEDDING_RETRIEVAL', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        print("sentence-transformers not available, embedding retrieval disabled")
+        return None
+    return ChunkEmbedder(
+        model_name=os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+        passage_chars=int(os.getenv('EMBEDDING_PASSAGE_CHARS', '1000')),
+        quantize=os.getenv('EMBEDDING_DTYPE', 'float32').lower() == 'int8'
+    )
+
+
+chunk_embedder = create_chunk_embedder()
+EMBEDDING_WEIGHT = float(os.getenv('EMBEDDING_WEIGHT', '0.5'))
+
+
+def build_hybrid_index(chunks, lexical_index):
+    """Embed the chunks and wrap the lexical index, or return it unchanged when embeddings are off"""
+    if chunk_embedder is None or not len(chunks):
+        return lexical_index
+    try:
+        embeddings = chunk_embedder.embed_chunks(chunks)
+    except Exception as e:
+        print(f"Chunk embedding failed, using lexical retrieval only: {e}")
+        return lexical_index
+    return HybridIndex(lexical_index, embeddings, chunk_embedder.model_name, EMBEDDING_WEIGHT)
@@ -0,0 +1,227 @@
+import io
+import json
+import struct
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from chunking import ChunkView
+from embeddings import EmbeddingMatrix, HybridIndex
+from retrieval import ChunkIndex, SectionIndex
+
+# Leading bytes of an encoded entry, followed by the header length
+MAGIC = b'DLXE1'
+HEADER_LENGTH = struct.Struct('>Q')
+
+# Strings at least this long are stored once however often they are referenced
+# (the document text is shared by the entry and its ChunkView)
+SHARED_STRING_MIN_CHARS = 1024
+
+
+def encode_entry(entry):
+    """
+    Serialise a cache value (a document entry, job record or LLM response)
+    without pickle: a JSON header describing the value plus an npz archive
+    holding its numeric arrays. Only the types below can be encoded, so
+    decoding a value from a shared store never runs arbitrary code.
+    """
+    encoder = EntryEncoder()
+    root = encoder.encode(entry)
+    header = json.dumps({'root': root, 'objects': encoder.objects}, ensure_ascii=False).encode('utf-8')
+
+    arrays = io.BytesIO()
+    np.savez(arrays, **encoder.arrays)
+    return MAGIC + HEADER_LENGTH.pack(len(header)) + header + arrays.getvalue()
+
+
+def decode_entry(data):
+    """Inverse of encode_entry; raises ValueError for data in any other format"""
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        raise ValueError("not an encoded cache entry")
+    offset = len(MAGIC)
+    (header_length,) = HEADER_LENGTH.unpack_from(data, offset)
+    offset += HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + header_length].decode('utf-8'))
+    with np.load(io.BytesIO(data[offset + header_length:]), allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    return EntryDecoder(header['objects'], arrays).decode(header['root'])
+
+
+class EntryEncoder:
+    """
+    Turns a value into JSON-compatible data. Shared objects (indexes, chunk
+    views, long strings) go into an object table once and are referenced by
+    position, so an entry keeps its sharing after a round trip.
+    """
+
+    def __init__(self):
+        self.objects = []
+        self.arrays = {}
+        self.object_ids = {}
+        self.keep_alive = []
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, str):
+            if len(value) < SHARED_STRING_MIN_CHARS:
+                return value
+            return self.shared(value, lambda: value)
+        if isinstance(value, dict):
+            return {str(key): self.encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        if isinstance(value, datetime):
+            return {'__type__': 'datetime', 'value': value.isoformat()}
+        if isinstance(value, np.ndarray):
+            return {'__type__': 'ndarray', 'name': self.array(value)}
+        if isinstance(value, array):
+            return {'__type__': 'array', 'typecode': value.typecode, 'name': self.array(np.asarray(value))}
+        if isinstance(value, ChunkView):
+            return self.shared(value, lambda: {
+                '__type__': 'ChunkView',
+                'text': self.encode(value.text),
+                'starts': self.encode(value.starts),
+                'ends': self.encode(value.ends)
+            })
+        if isinstance(value, ChunkIndex):
+            return self.shared(value, lambda: self.encode_chunk_index(value))
+        if isinstance(value, SectionIndex):
+            return self.shared(value, lambda: {
+                '__type__': 'SectionIndex',
+                'chunk_index': self.encode(value.chunk_index),
+                'section_index': self.encode(value.section_index),
+                'top_sections': value.top_sections,
+                'section_ranges': self.array(np.asarray(value.section_ranges, dtype=np.int64).reshape(-1, 2))
+            })
+        if isinstance(value, HybridIndex):
+            return self.shared(value, lambda: {
+                '__type__': 'HybridIndex',
+                'lexical_index': self.encode(value.lexical_index),
+                'embeddings': self.encode(value.embeddings),
+                'model_name': value.model_name,
+                'embedding_weight': value.embedding_weight,
+                'candidates': value.candidates
+            })
+        if isinstance(value, EmbeddingMatrix):
+            return self.shared(value, lambda: {
+                '__type__': 'EmbeddingMatrix',
+                'quantized': value.quantized,
+                'vectors': self.array(value.vectors),
+                'scales': self.array(value.scales) if value.scales is not None else None
+            })
+        raise TypeError(f"Cannot encode {type(value).__name__} in a cache entry")
+
+    def encode_chunk_index(self, index):
+        # A snapshot shares lists that may hold more chunks than it covers
+        count = index.num_chunks
+        postings = {term: index.term_postings(term) for term in list(index.postings)}
+        terms = [term for term, term_postings in postings.items() if term_postings]
+        # Postings as three flat arrays: term i owns entries offsets[i]:offsets[i+1]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=offsets[1:])
+        flat = [posting for term in terms for posting in postings[term]]
+        chunk_ids = np.fromiter((chunk_id for chunk_id, _ in flat), dtype=np.int32, count=len(flat))
+        tfs = np.fromiter((tf for _, tf in flat), dtype=np.int32, count=len(flat))
+        return {
+            '__type__': 'ChunkIndex',
+            'num_chunks': index.num_chunks,
+            'total_length': index.total_length,
+            'avg_doc_length': index.avg_doc_length,
+            'terms': terms,
+            'offsets': self.array(offsets),
+            'chunk_ids': self.array(chunk_ids),
+            'tfs': self.array(tfs),
+            'doc_lengths': self.array(np.asarray(index.doc_lengths[:count], dtype=np.int64)),
+            'statute_refs': self.array(np.asarray(index.statute_refs[:count], dtype=np.int64)),
+            'has_section_ref': self.array(np.asarray(index.has_section_ref[:count], dtype=bool)),
+            'has_subsection': self.array(np.asarray(index.has_subsection[:count], dtype=bool)),
+            'has_amount': self.array(np.asarray(index.has_amount[:count], dtype=bool)),
+            'priors': self.array(np.asarray(index.priors[:count], dtype=np.int64)),
+            'prior_order': self.array(np.asarray(index.prior_order, dtype=np.int64))
+        }
+
+    def shared(self, value, encode):
+        object_id = self.object_ids.get(id(value))
+        if object_id is None:
+            # Keep the value referenced so its id is not reused while encoding
+            self.keep_alive.append(value)
+            object_id = self.object_ids[id(value)] = len(self.objects)
+            self.objects.append(None)
+            self.objects[object_id] = encode()
+        return {'__ref__': object_id}
+
+    def array(self, value):
+        name = f'a{len(self.arrays)}'
+        self.arrays[name] = np.ascontiguousarray(value)
+        return name
+
+
+class EntryDecoder:
+    """Rebuilds a value from the header and arrays written by EntryEncoder"""
+
+    def __init__(self, objects, arrays):
+        self.objects = objects
+        self.arrays = arrays
+        self.decoded = {}
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '__ref__' in value:
+            object_id = value['__ref__']
+            if object_id not in self.decoded:
+                self.decoded[object_id] = self.decode(self.objects[object_id])
+            return self.decoded[object_id]
+
+        value_type = value.get('__type__')
+        if value_type is None:
+            return {key: self.decode(item) for key, item in value.items()}
+        if value_type == 'datetime':
+            return datetime.fromisoformat(value['value'])
+        if value_type == 'ndarray':
+            return self.arrays[value['name']]
+        if value_type == 'array':
+            return array(value['typecode'], self.arrays[value['name']].tobytes())
+        if value_type == 'ChunkView':
+            return ChunkView(self.decode(value['text']), self.decode(value['starts']), self.decode(value['ends']))
+        if value_type == 'ChunkIndex':
+            return self.decode_chunk_index(value)
+        if value_type == 'SectionIndex':
+            index = SectionIndex.__new__(SectionIndex)
+            index.chunk_index = self.decode(value['chunk_index'])
+            index.section_index = self.decode(value['section_index'])
+            index.top_sections = value['top_sections']
+            index.section_ranges = [tuple(r) for r in self.arrays[value['section_ranges']].tolist()]
+            return index
+        if value_type == 'HybridIndex':
+            return HybridIndex(self.decode(value['lexical_index']), self.decode(value['embeddings']),
+                               value['model_name'], value['embedding_weight'], value['candidates'])
+        if value_type == 'EmbeddingMatrix':
+            matrix = EmbeddingMatrix.__new__(EmbeddingMatrix)
+            matrix.quantized = value['quantized']
+            matrix.vectors = self.arrays[value['vectors']]
+            matrix.scales = self.arrays[value['scales']] if value['scales'] is not None else None
+            return matrix
+        raise ValueError(f"Unknown encoded type {value_type!r}")
+
+    def decode_chunk_index(self, value):
+        index = ChunkIndex.__new__(ChunkIndex)
+        index.num_chunks = value['num_chunks']
+        index.total_length = value['total_length']
+        index.avg_doc_length = value['avg_doc_length']
+        offsets = self.arrays[value['offsets']].tolist()
+        chunk_ids = self.arrays[value['chunk_ids']].tolist()
+        tfs = self.arrays[value['tfs']].tolist()
+        index.postings = {
+            term: list(zip(chunk_ids[start:end], tfs[start:end]))
+            for term, start, end in zip(value['terms'], offsets, offsets[1:])
+        }
+        for name in ('doc_lengths', 'statute_refs', 'has_section_ref', 'has_subsection',
+                     'has_amount', 'priors', 'prior_order'):
+            setattr(index, name, self.arrays[value[name]].tolist())
+        return index
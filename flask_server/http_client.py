@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+class RateLimitError(ValueError):
+    """The API answered 429 (after the client's retries, unless turned off); retry_after is the server's hint in seconds"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Set by the tracking connections when a request had to open a new socket
+connection_state = threading.local()
+
+
+class TrackingHTTPConnection(HTTPConnection):
+    def connect(self):
+        connection_state.new_connections = getattr(connection_state, 'new_connections', 0) + 1
+        super().connect()
+
+
+class TrackingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        connection_state.new_connections = getattr(connection_state, 'new_connections', 0) + 1
+        super().connect()
+
+
+class TrackingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TrackingHTTPConnection
+
+
+class TrackingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TrackingHTTPSConnection
+
+
+class TrackingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections record when a new TCP/TLS connection is opened"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TrackingHTTPConnectionPool,
+            'https': TrackingHTTPSConnectionPool,
+        }
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PooledHTTPClient:
+    """
+    Thread-safe keep-alive HTTP client shared by every API call.
+
+    Connections are pooled per host (pool_size sockets), connect and read
+    timeouts are separate, and 429/5xx responses or connection errors are
+    retried up to max_retries times with jittered exponential backoff,
+    waiting at least as long as the server's Retry-After header asks.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=30.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = TrackingHTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.stats_lock = threading.Lock()
+        self.total_calls = 0
+        self.total_attempts = 0
+        self.total_retries = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def request(self, method, url, timeout=None, retry_on_429=True, **kwargs):
+        """
+        Send a request through the pool with bounded retries. The returned
+        response carries per-call stats in response.call_stats.
+        retry_on_429=False returns the first 429 to the caller, for callers
+        that run their own rate-limit backoff.
+        """
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        attempt = 0
+        connection_state.new_connections = 0
+
+        while True:
+            attempt += 1
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if attempt > self.max_retries:
+                    self._record(attempt, connection_state.new_connections)
+                    raise
+                delay = self.backoff_delay(attempt - 1)
+                print(f"Connection to {url} failed, retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries + 1})")
+                time.sleep(delay)
+                continue
+
+            retryable = response.status_code in RETRY_STATUS_CODES and (retry_on_429 or response.status_code != 429)
+            if retryable and attempt <= self.max_retries:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                delay = self.backoff_delay(attempt - 1, retry_after)
+                print(f"{url} returned {response.status_code}, retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries + 1})")
+                response.close()
+                time.sleep(delay)
+                continue
+
+            new_connections = connection_state.new_connections
+            self._record(attempt, new_connections)
+            response.call_stats = {
+                "attempts": attempt,
+                "new_connections": new_connections,
+                "connection_reused": new_connections == 0
+            }
+            return response
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def _record(self, attempts, new_connections):
+        with self.stats_lock:
+            self.total_calls += 1
+            self.total_attempts += attempts
+            self.total_retries += attempts - 1
+            self.new_connections += new_connections
+            self.reused_connections += max(attempts - new_connections, 0)
+
+    def stats(self):
+        """Aggregate connection reuse and retry counters"""
+        with self.stats_lock:
+            return {
+                "calls": self.total_calls,
+                "attempts": self.total_attempts,
+                "retries": self.total_retries,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "reuse_rate": round(self.reused_connections / self.total_attempts, 3) if self.total_attempts else 0.0
+            }
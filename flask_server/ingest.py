@@ -0,0 +1,55 @@
+import time
+
+from chunking import Chunker, ChunkView, PageBuffer
+from retrieval import ChunkIndex
+
+
+def ingest_pages(cache, file_hash, pages, chunker=None, publish_every=5, on_progress=None):
+    """
+    Run pages through the chunker into the cache. Every publish_every
+    chunks a snapshot of the chunks and index is published as partial so
+    questions about the first pages can be answered while the rest is
+    ingesting; later pages never change a published snapshot.
+    on_progress(pages_ingested, chunks_count) is called after each publish.
+    Returns (text, chunks, index) for the completed document, with chunks
+    as a ChunkView over text.
+
+    The document is held once, as its pages: chunks are spans read from the
+    pages on demand, and chunk strings only exist while they are indexed.
+    """
+    chunker = chunker or Chunker()
+    start_time = time.time()
+    page_buffer = PageBuffer()
+    index = ChunkIndex()
+    last_published = 0
+    page_count = 0
+
+    for page_count, page_text in enumerate(pages, start=1):
+        page_text += "\n"
+        page_buffer.append(page_text)
+        spans = chunker.feed(page_text)
+        if not spans:
+            continue
+
+        index.extend(chunker.text_of(span) for span in spans)
+        if len(chunker.starts) - last_published >= publish_every:
+            chunks = ChunkView(page_buffer, chunker.starts[:], chunker.ends[:])
+            cache.store_partial(file_hash, chunks, index.snapshot(), page_count)
+            last_published = len(chunks)
+            print(f"Ingest {file_hash}: {page_count} pages, {len(chunks)} chunks published")
+            if on_progress:
+                on_progress(page_count, len(chunks))
+
+    index.extend(chunker.text_of(span) for span in chunker.finish())
+
+    # Join the pages once; the last partial entry moves over to the joined
+    # text so the pages can be freed while the document is stored
+    text = page_buffer.join()
+    page_buffer = None
+    chunks = chunker.view(text)
+    if last_published:
+        cache.store_partial(file_hash, chunks, index.snapshot(), page_count)
+    if on_progress:
+        on_progress(page_count, len(chunks))
+    print(f"Ingested {page_count} pages into {len(chunks)} chunks in {time.time() - start_time:.2f}s")
+    return text, chunks, index
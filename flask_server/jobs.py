@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_backends import MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+
+
+class Job:
+    """Handle passed to a running job function for reporting stage and progress"""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.id = job_id
+        self.current_stage = None
+        self.stage_started = None
+
+    def stage(self, name, progress=None):
+        """Enter a new stage, closing the timing of the previous one"""
+        self._close_stage()
+        self.current_stage = name
+        self.stage_started = time.time()
+        fields = {"stage": name}
+        if progress is not None:
+            fields["progress"] = progress
+        self.manager.update(self.id, **fields)
+
+    def update(self, **fields):
+        self.manager.update(self.id, **fields)
+
+    def _close_stage(self):
+        if self.current_stage is not None:
+            elapsed = round(time.time() - self.stage_started, 3)
+            self.manager.update_timing(self.id, self.current_stage, elapsed)
+            self.current_stage = None
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a bounded worker pool and keeps their state
+    (stage, progress, timings, result) in a job store, so with the sqlite
+    or redis store any worker can report on a job and the state survives
+    restarts. Records are replaced on every update, never changed in place.
+    """
+
+    key_prefix = 'job:'
+
+    def __init__(self, store, max_workers=2, ttl_seconds=24 * 3600, stale_seconds=600):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest-job')
+        self.lock = threading.Lock()
+        # Ids of jobs waiting in this process's executor queue
+        self.pending = set()
+
+    def submit(self, job_type, func, *args):
+        """Queue func(job, *args); returns the job id immediately"""
+        self.store.delete_expired()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._save({
+            "job_id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "timings": {},
+            "file_hash": None,
+            "result": None,
+            "error": None,
+            "worker_pid": os.getpid(),
+            "created_at": now,
+            "updated_at": now
+        })
+        with self.lock:
+            self.pending.add(job_id)
+        self.executor.submit(self._run, job_id, func, args)
+        return job_id
+
+    def _run(self, job_id, func, args):
+        with self.lock:
+            self.pending.discard(job_id)
+        job = Job(self, job_id)
+        started = time.time()
+        self.update(job_id, status="running")
+        try:
+            result = func(job, *args)
+            job._close_stage()
+            self.update_timing(job_id, "total", round(time.time() - started, 3))
+            self.update(
+                job_id,
+                status="completed" if result.get("success", True) else "failed",
+                stage="done",
+                progress=1.0,
+                result=result,
+                file_hash=result.get("file_hash") or result.get("combined_hash"),
+                error=result.get("error")
+            )
+        except Exception as e:
+            traceback.print_exc()
+            job._close_stage()
+            self.update(job_id, status="failed", error=str(e))
+
+    def get(self, job_id):
+        """Current job state, or None for unknown ids"""
+        job = self.store.get(self.key_prefix + job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if time.time() - job["updated_at"] <= self.stale_seconds:
+            return job
+        # A running job that stopped updating, or a queued job that never
+        # started, belonged to a worker that went away. Jobs still waiting in
+        # this process's queue are known to be alive.
+        if job["status"] == "running":
+            job["status"] = "interrupted"
+            job["error"] = "Job stopped updating - the worker running it was probably restarted"
+        elif job["status"] == "queued" and not self._is_pending(job_id):
+            job["status"] = "interrupted"
+            job["error"] = "Job never started - the worker it was queued on was probably restarted"
+        return job
+
+    def _is_pending(self, job_id):
+        with self.lock:
+            return job_id in self.pending
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            job = self.store.get(self.key_prefix + job_id)
+            if job is None:
+                return
+            self._save({**job, **fields, "updated_at": time.time()})
+
+    def update_timing(self, job_id, stage, seconds):
+        with self.lock:
+            job = self.store.get(self.key_prefix + job_id)
+            if job is None:
+                return
+            timings = {**job["timings"], stage: job["timings"].get(stage, 0) + seconds}
+            self._save({**job, "timings": timings, "updated_at": time.time()})
+
+    def _save(self, job):
+        self.store.set(self.key_prefix + job["job_id"], job, ttl_seconds=self.ttl_seconds)
+
+
+def create_job_store(backend_name=None):
+    """
+    Storage for job records, kept apart from the document cache so a job is
+    never evicted by a large upload and does not count in the cache stats.
+    Uses the kind of backend selected by JOB_STORE_BACKEND (default: the
+    PDF_CACHE_BACKEND setting): an unbounded in-memory store, a separate
+    SQLite file, or its own key prefix on the Redis server.
+    """
+    backend_name = (backend_name or os.getenv('JOB_STORE_BACKEND') or
+                    os.getenv('PDF_CACHE_BACKEND', 'memory')).lower()
+    try:
+        if backend_name == 'sqlite':
+            return SQLiteCacheBackend(os.getenv('JOB_STORE_SQLITE_PATH', os.path.join('cache', 'jobs.sqlite3')))
+        if backend_name == 'redis':
+            url = os.getenv('JOB_STORE_REDIS_URL') or os.getenv('PDF_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+            return RedisCacheBackend(url, key_prefix='doculix:')
+    except Exception as e:
+        print(f"Failed to start {backend_name} job store: {e}, keeping job state in memory")
+    # No byte budget: records leave only when their TTL has passed
+    return MemoryCacheBackend(max_bytes=None)
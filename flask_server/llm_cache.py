@@ -0,0 +1,82 @@
+import hashlib
+import json
+import threading
+
+from cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM completions keyed by
+    hash(model, prompt, max_tokens, temperature).
+
+    Responses live in a byte-bounded in-memory LRU and, when a path is
+    given, in a SQLite file so they survive restarts and are shared by
+    local workers. Calls above max_temperature are non-deterministic and
+    bypass the cache unless the caller asks for caching explicitly.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=24 * 3600, path=None, max_temperature=0.3):
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.memory = MemoryCacheBackend(max_bytes)
+        self.disk = None
+        if path:
+            try:
+                self.disk = SQLiteCacheBackend(path)
+            except Exception as e:
+                print(f"LLM response cache persistence disabled: {e}")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def make_key(model, prompt, max_tokens, temperature):
+        payload = json.dumps([model, prompt, max_tokens, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def should_cache(self, temperature, use_cache=None):
+        """use_cache=None caches only deterministic calls; True/False force the decision"""
+        if use_cache is None:
+            use_cache = temperature <= self.max_temperature
+        if not use_cache:
+            with self.lock:
+                self.bypassed += 1
+        return use_cache
+
+    def get(self, key):
+        response = self.memory.get(key)
+        if response is None and self.disk is not None:
+            response = self.disk.get(key)
+            if response is not None:
+                self.memory.set(key, response, ttl_seconds=self.ttl_seconds)
+
+        with self.lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def set(self, key, response):
+        self.memory.set(key, response, ttl_seconds=self.ttl_seconds)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, response, ttl_seconds=self.ttl_seconds)
+            except Exception as e:
+                print(f"Failed to persist LLM response: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.memory.evictions,
+                "size_bytes": self.memory.size_bytes(),
+                "max_bytes": self.memory.max_bytes,
+                "persistent": self.disk is not None
+            }
@@ -1,54 +1,283 @@
-# This Python 3 environment comes with many helpful analytics libraries installed
-# It is defined by the kaggle/python Docker image: https://github.com/kaggle/docker-python
-# For example, here's several helpful packages to load
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
-import numpy as np # linear algebra
-import pandas as pd # data processing, CSV file I/O (e.g. pd.read_csv)
+device = "cpu"
+MODEL_NAME = os.getenv('PARAPHRASE_MODEL', "humarin/chatgpt_paraphraser_on_T5_base")
 
-# Input data files are available in the read-only "../input/" directory
-# For example, running this (by clicking run or pressing Shift+Enter) will list all files under the input directory
+# Inference backend: torch (FP32) or torch-int8 (dynamic int8 Linear layers);
+# both decode with the KV cache
+PARAPHRASE_BACKENDS = ('torch', 'torch-int8')
+PARAPHRASE_BACKEND = os.getenv('PARAPHRASE_BACKEND', 'torch')
 
-import os
-for dirname, _, filenames in os.walk('/kaggle/input'):
-    for filename in filenames:
-        print(os.path.join(dirname, filename))
+# Named decode settings, cheapest first; requests pick one by name
+PARAPHRASE_PROFILES = {
+    # Greedy decoding, a single paraphrase
+    "fast": {
+        "num_beams": 1,
+        "num_return_sequences": 1,
+        "repetition_penalty": 10.0,
+        "no_repeat_ngram_size": 2,
+        "max_length": 96
+    },
+    # Nucleus sampling, three paraphrases from one decoding pass
+    "balanced": {
+        "num_beams": 1,
+        "num_return_sequences": 3,
+        "do_sample": True,
+        "top_p": 0.9,
+        "temperature": 0.7,
+        "repetition_penalty": 10.0,
+        "no_repeat_ngram_size": 2,
+        "max_length": 128
+    },
+    # Diverse beam search, five paraphrases (the original settings)
+    "diverse": {
+        "num_beams": 5,
+        "num_beam_groups": 5,
+        "num_return_sequences": 5,
+        "diversity_penalty": 3.0,
+        "temperature": 0.7,
+        "repetition_penalty": 10.0,
+        "no_repeat_ngram_size": 2,
+        "max_length": 128
+    }
+}
+DEFAULT_PARAPHRASE_PROFILE = os.getenv('PARAPHRASE_PROFILE', 'diverse')
 
-# You can write up to 20GB to the current directory (/kaggle/working/) that gets preserved as output when you create a version using "Save & Run All" 
-# You can also write temporary files to /kaggle/temp/, but they won't be saved outside of the current session
+# The T5 model is loaded on first use (or by the app's warm-up thread) so
+# importing this module doesn't pull in torch/transformers
+tokenizer = None
+model = None
+model_lock = threading.Lock()
 
-device = "cpu"
+def load_model():
+    """Load the paraphrase tokenizer and model once; safe to call from several threads"""
+    global tokenizer, model
+    with model_lock:
+        if model is None:
+            timer = time.time()
+            from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+            backend = PARAPHRASE_BACKEND
+            if backend not in PARAPHRASE_BACKENDS:
+                raise ValueError(f"Unknown paraphrase backend {backend!r}, expected one of {', '.join(PARAPHRASE_BACKENDS)}")
+
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME).to(device)
+            model.eval()
+            if backend == 'torch-int8':
+                import torch
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            print(f'Loaded paraphrase model [{backend}] in {time.time()-timer} seconds')
+    return tokenizer, model
+
+def is_model_loaded():
+    return model is not None
+
+class ParaphraseBatcher:
+    """
+    Collects concurrent paraphrase requests for up to max_wait_ms (or until
+    max_batch_size requests are queued) and runs them through a single padded
+    model.generate call, then fans the results back to the waiting callers.
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=10):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.worker = None
+        self.worker_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.total_batches = 0
+        self.total_requests = 0
+        self.total_batch_time = 0.0
+        self.largest_batch = 0
+        self.last_batch = {}
+
+    def submit(self, question, generate_kwargs):
+        """Queue one paraphrase request and block until its batch has been generated"""
+        self._ensure_worker()
+        future = Future()
+        self.requests.put((question, generate_kwargs, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        with self.worker_lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name="paraphrase-batcher", daemon=True)
+                self.worker.start()
+
+    def _collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Only requests with identical generation settings can share a generate call
+            groups = {}
+            for question, generate_kwargs, future in batch:
+                key = tuple(sorted(generate_kwargs.items()))
+                groups.setdefault(key, []).append((question, future))
 
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+            for key, requests in groups.items():
+                self._generate(requests, dict(key))
 
-tokenizer = AutoTokenizer.from_pretrained("humarin/chatgpt_paraphraser_on_T5_base")
+    def _generate(self, requests, generate_kwargs):
+        timer = time.time()
+        try:
+            questions = [question for question, future in requests]
+            results = generate_paraphrases(questions, **generate_kwargs)
+            for (question, future), result in zip(requests, results):
+                future.set_result(result)
+        except Exception as e:
+            for question, future in requests:
+                future.set_exception(e)
 
-model = AutoModelForSeq2SeqLM.from_pretrained("humarin/chatgpt_paraphraser_on_T5_base").to(device)
+        elapsed = time.time() - timer
+        with self.stats_lock:
+            self.total_batches += 1
+            self.total_requests += len(requests)
+            self.total_batch_time += elapsed
+            self.largest_batch = max(self.largest_batch, len(requests))
+            self.last_batch = {"size": len(requests), "generate_ms": round(elapsed * 1000, 1)}
+        print(f'Paraphrased batch of {len(requests)} in {elapsed:.2f} seconds')
 
-def paraphrase(
-    question,
+    def stats(self):
+        """Per-batch throughput statistics"""
+        with self.stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "total_batches": self.total_batches,
+                "total_requests": self.total_requests,
+                "avg_batch_size": round(self.total_requests / self.total_batches, 2) if self.total_batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "avg_generate_ms": round(self.total_batch_time * 1000 / self.total_batches, 1) if self.total_batches else 0.0,
+                "last_batch": self.last_batch,
+                "queued": self.requests.qsize()
+            }
+
+
+class ParaphraseMemo:
+    """
+    LRU memo of (text, profile, overrides) -> paraphrases, so paraphrasing
+    an answer that was paraphrased before skips generation entirely.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, paraphrases):
+        with self.lock:
+            self.entries[key] = paraphrases
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+batcher = ParaphraseBatcher(
+    max_batch_size=int(os.getenv('PARAPHRASE_MAX_BATCH_SIZE', '8')),
+    max_wait_ms=float(os.getenv('PARAPHRASE_MAX_WAIT_MS', '10'))
+)
+memo = ParaphraseMemo(max_entries=int(os.getenv('PARAPHRASE_MEMO_SIZE', '256')))
+
+def generate_paraphrases(
+    questions,
     num_beams=5,
-    num_beam_groups=5,
+    num_beam_groups=1,
     num_return_sequences=5,
     repetition_penalty=10.0,
-    diversity_penalty=3.0,
+    diversity_penalty=0.0,
     no_repeat_ngram_size=2,
     temperature=0.7,
-    max_length=128
+    max_length=128,
+    do_sample=False,
+    top_p=1.0
 ):
-    input_ids = tokenizer(
-        f'paraphrase: {question}',
+    """Paraphrase a batch of texts with one generate call; returns one list of paraphrases per text"""
+    tokenizer, model = load_model()
+
+    inputs = tokenizer(
+        [f'paraphrase: {question}' for question in questions],
         return_tensors="pt", padding="longest",
         max_length=max_length,
         truncation=True,
-    ).input_ids
+    )
+    
+    # Only pass the settings the decoding strategy uses
+    strategy_kwargs = {}
+    if do_sample:
+        strategy_kwargs.update(do_sample=True, temperature=temperature, top_p=top_p)
+    if num_beam_groups > 1:
+        strategy_kwargs.update(num_beam_groups=num_beam_groups, diversity_penalty=diversity_penalty)
     
     outputs = model.generate(
-        input_ids, temperature=temperature, repetition_penalty=repetition_penalty,
+        inputs.input_ids, attention_mask=inputs.attention_mask,
+        repetition_penalty=repetition_penalty,
         num_return_sequences=num_return_sequences, no_repeat_ngram_size=no_repeat_ngram_size,
-        num_beams=num_beams, num_beam_groups=num_beam_groups,
-        max_length=max_length, diversity_penalty=diversity_penalty
+        num_beams=num_beams, max_length=max_length, use_cache=True,
+        **strategy_kwargs
     )
 
     res = tokenizer.batch_decode(outputs, skip_special_tokens=True)
 
-    return res
\ No newline at end of file
+    # generate returns num_return_sequences consecutive rows per input
+    return [
+        res[i * num_return_sequences:(i + 1) * num_return_sequences]
+        for i in range(len(questions))
+    ]
+
+def paraphrase(question, profile=None, **overrides):
+    """
+    Paraphrase question with a named decode profile (PARAPHRASE_PROFILE by
+    default); keyword arguments override single profile settings
+    """
+    profile = profile or DEFAULT_PARAPHRASE_PROFILE
+    if profile not in PARAPHRASE_PROFILES:
+        raise ValueError(f"Unknown paraphrase profile {profile!r}, expected one of {', '.join(PARAPHRASE_PROFILES)}")
+
+    key = (question, profile, tuple(sorted(overrides.items())))
+    paraphrases = memo.get(key)
+    if paraphrases is None:
+        paraphrases = batcher.submit(question, {**PARAPHRASE_PROFILES[profile], **overrides})
+        memo.set(key, paraphrases)
+    return list(paraphrases)
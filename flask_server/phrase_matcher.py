@@ -0,0 +1,89 @@
+from collections import deque
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a fixed phrase list, built once at import.
+
+    One pass over the text finds every occurrence of every phrase (substring
+    semantics, like `phrase in text`, overlaps included), so scanning for a
+    whole keyword table costs O(len(text) + hits) instead of one scan per
+    phrase. Uses the pyahocorasick C extension when installed and a
+    pure-Python automaton otherwise.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(dict.fromkeys(phrases))
+        if AHOCORASICK_AVAILABLE:
+            self.automaton = ahocorasick.Automaton()
+            for phrase in self.phrases:
+                self.automaton.add_word(phrase, phrase)
+            self.automaton.make_automaton()
+        else:
+            self._build()
+
+    def _build(self):
+        # Trie with goto, failure and output links
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for phrase in self.phrases:
+            node = 0
+            for ch in phrase:
+                next_node = self.goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][ch] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = next_node
+            self.output[node] = self.output[node] + (phrase,)
+
+        # Breadth-first failure links; outputs inherit from their failure node
+        queue = deque(self.goto[0].values())  # depth-1 nodes fail to the root
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text):
+        """Yield (start, phrase) for every occurrence, in order of end position"""
+        if AHOCORASICK_AVAILABLE:
+            for end, phrase in self.automaton.iter(text):
+                yield end - len(phrase) + 1, phrase
+            return
+
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for phrase in output[node]:
+                yield i - len(phrase) + 1, phrase
+
+    def find(self, text):
+        """Map each phrase found in text to the list of its start positions"""
+        positions = {}
+        for start, phrase in self.iter_matches(text):
+            positions.setdefault(phrase, []).append(start)
+        return positions
+
+    def counts(self, text):
+        """Map each phrase found in text to its number of occurrences"""
+        counts = {}
+        for _, phrase in self.iter_matches(text):
+            counts[phrase] = counts.get(phrase, 0) + 1
+        return counts
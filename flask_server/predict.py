@@ -1,48 +1,247 @@
 import torch
 import time
-from torch.utils.data import DataLoader, RandomSampler, SequentialSampler
-from multiprocessing import cpu_count
+import os
+import copy
+import hashlib
+import importlib.util
+import tempfile
+import threading
+import numpy as np
+from collections import OrderedDict
 
 from transformers import (
     AutoConfig,
     AutoModelForQuestionAnswering,
-    AutoTokenizer,
-    squad_convert_examples_to_features
+    AutoTokenizer
 )
 
-from transformers.data.processors.squad import SquadResult, SquadV2Processor, SquadExample
-from transformers.data.metrics.squad_metrics import compute_predictions_logits
+from transformers.data.processors.squad import (
+    MULTI_SEP_TOKENS_TOKENIZERS_SET,
+    SquadExample,
+    SquadFeatures
+)
+from transformers.data.metrics.squad_metrics import get_final_text
+from transformers.modeling_outputs import QuestionAnsweringModelOutput
 
+# onnxruntime is only imported when an ONNX backend is loaded
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec('onnxruntime') is not None
 
-def run_prediction(question_texts, context_text, model_path, n_best_size):
-    max_seq_length = 512
-    doc_stride = 256
-    n_best_size = n_best_size
-    max_query_length = 64
-    max_answer_length = 512
-    do_lower_case = False
-    null_score_diff_threshold = 0.0
+# Tokenizers whose words need a leading space to tokenize as they do mid-sentence
+PREFIX_SPACE_MODEL_TYPES = ('roberta', 'longformer', 'bart')
 
-    def to_list(tensor):
-        return tensor.detach().cpu().tolist()
+# CPU inference backends: FP32 PyTorch, PyTorch with dynamic int8 Linear
+# layers, and an exported ONNX Runtime graph (optionally int8-quantised)
+QA_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+ONNX_CACHE_DIR = os.getenv('QA_ONNX_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'qa-onnx'))
+ONNX_INPUT_NAMES = ['input_ids', 'attention_mask', 'token_type_ids']
+ONNX_OUTPUT_NAMES = ['start_logits', 'end_logits']
 
-    config_class, model_class, tokenizer_class = (AutoConfig, AutoModelForQuestionAnswering, AutoTokenizer)
-    config = config_class.from_pretrained(model_path)
-    tokenizer = tokenizer_class.from_pretrained(model_path, do_lower_case=True, use_fast=False)
-    model = model_class.from_pretrained(model_path, config=config)
 
-    device = torch.device("cpu")
-    model.to(device)
+def resolve_backend(backend):
+    """Validate a backend name, falling back to torch when onnxruntime is missing"""
+    if backend not in QA_BACKENDS:
+        raise ValueError(f"Unknown QA backend {backend!r}, expected one of {', '.join(QA_BACKENDS)}")
+    if backend.startswith('onnx') and not ONNXRUNTIME_AVAILABLE:
+        print(f"onnxruntime not available, using the torch QA backend instead of {backend}")
+        return 'torch'
+    return backend
 
-    processor = SquadV2Processor()
-    examples = []
 
-    timer = time.time()
-    for i, question_text in enumerate(question_texts):
-        
-        example = SquadExample(
-            qas_id=str(i),
-            question_text=question_text,
+def onnx_model_file(model_path, quantized):
+    """Cache file for a model's ONNX export; local models are keyed on their file times too"""
+    key = model_path
+    if os.path.isdir(model_path):
+        key += str(max(os.path.getmtime(os.path.join(model_path, name)) for name in os.listdir(model_path)))
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(ONNX_CACHE_DIR, f"{name}{'-int8' if quantized else ''}.onnx")
+
+
+def export_onnx_model(model, model_path, quantized=False):
+    """Export the QA model to ONNX (and int8-quantise it) once; returns the cached file"""
+    path = onnx_model_file(model_path, quantized)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    fp32_path = onnx_model_file(model_path, False)
+    if not os.path.exists(fp32_path):
+        timer = time.time()
+        dummy = torch.ones((1, 16), dtype=torch.long)
+        tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        torch.onnx.export(
+            model,
+            (dummy, dummy, torch.zeros_like(dummy)),
+            tmp_path,
+            input_names=ONNX_INPUT_NAMES,
+            output_names=ONNX_OUTPUT_NAMES,
+            dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in ONNX_INPUT_NAMES + ONNX_OUTPUT_NAMES},
+            opset_version=14,
+            dynamo=False,
+        )
+        os.replace(tmp_path, fp32_path)
+        print(f'Exported QA model {model_path} to ONNX in {time.time()-timer} seconds')
+
+    if quantized:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, path)
+    return path
+
+
+class OnnxQAModel:
+    """
+    ONNX Runtime session standing in for the PyTorch QA model: called with
+    the same keyword tensors, it returns a QuestionAnsweringModelOutput.
+    """
+
+    def __init__(self, path, num_threads=0):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def __call__(self, **inputs):
+        feeds = {name: tensor.numpy() for name, tensor in inputs.items() if name in self.input_names}
+        start_logits, end_logits = self.session.run(ONNX_OUTPUT_NAMES, feeds)
+        return QuestionAnsweringModelOutput(
+            start_logits=torch.from_numpy(start_logits),
+            end_logits=torch.from_numpy(end_logits)
+        )
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded QA models keyed by model_path and backend.
+
+    Config, tokenizer and model are loaded once per path and backend and kept
+    resident; when more than max_models are in use the least recently used
+    one is unloaded.
+    """
+
+    def __init__(self, max_models=2, warm_up=False, backend='torch', onnx_threads=0):
+        self.max_models = max_models
+        self.warm_up_on_load = warm_up
+        self.backend = backend
+        self.onnx_threads = onnx_threads
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_locks = {}
+
+    def get(self, model_path, backend=None):
+        """Return (config, tokenizer, model) for model_path, loading it on first use"""
+        key = (model_path, resolve_backend(backend or self.backend))
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available;
+        # the per-key lock stops concurrent requests loading the same model twice
+        with load_lock:
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    return self.models[key]
+
+            loaded = self._load(*key)
+
+            with self.lock:
+                self.models[key] = loaded
+                while len(self.models) > self.max_models:
+                    evicted_key, _ = self.models.popitem(last=False)
+                    self.load_locks.pop(evicted_key, None)
+                    print(f'Unloaded QA model {evicted_key[0]} [{evicted_key[1]}] (LRU)')
+            return loaded
+
+    def _load(self, model_path, backend):
+        timer = time.time()
+        config = AutoConfig.from_pretrained(model_path)
+        tokenizer_kwargs = {"add_prefix_space": True} if config.model_type in PREFIX_SPACE_MODEL_TYPES else {}
+        tokenizer = AutoTokenizer.from_pretrained(model_path, do_lower_case=True, use_fast=True, **tokenizer_kwargs)
+        model = AutoModelForQuestionAnswering.from_pretrained(model_path, config=config)
+        model.to(torch.device("cpu"))
+        model.eval()
+
+        if backend == 'torch-int8':
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend.startswith('onnx'):
+            onnx_path = export_onnx_model(model, model_path, quantized=backend == 'onnx-int8')
+            model = OnnxQAModel(onnx_path, num_threads=self.onnx_threads)
+        print(f'Loaded QA model {model_path} [{backend}] in {time.time()-timer} seconds')
+
+        if self.warm_up_on_load:
+            self.warm_up(tokenizer, model)
+
+        return config, tokenizer, model
+
+    def warm_up(self, tokenizer, model):
+        """Run one small forward pass so the first real request doesn't pay for lazy initialisation"""
+        timer = time.time()
+        inputs = tokenizer("Who are the parties?", "This agreement is made between the parties.", return_tensors="pt")
+        with torch.no_grad():
+            model(**inputs)
+        print(f'Warmed up QA model in {time.time()-timer} seconds')
+
+    def unload(self, model_path, backend=None):
+        """Drop a loaded model (every backend of it unless one is given); returns True if any was loaded"""
+        with self.lock:
+            keys = [key for key in self.models if key[0] == model_path and backend in (None, key[1])]
+            for key in keys:
+                self.load_locks.pop(key, None)
+                del self.models[key]
+            return bool(keys)
+
+    def loaded_models(self):
+        """Models currently resident as "path [backend]", least recently used first"""
+        with self.lock:
+            return [f"{model_path} [{backend}]" for model_path, backend in self.models]
+
+
+model_registry = ModelRegistry(
+    max_models=int(os.getenv('QA_MAX_LOADED_MODELS', '2')),
+    warm_up=os.getenv('QA_MODEL_WARMUP', 'false').lower() == 'true',
+    backend=os.getenv('QA_BACKEND', 'torch'),
+    onnx_threads=int(os.getenv('QA_ONNX_THREADS', '0'))
+)
+
+
+class WindowFeatures(SquadFeatures):
+    """
+    SquadFeatures plus where the context sits in the window (context_offset),
+    the first context token it holds (context_start) and which of its tokens
+    have their max context here, as an array, for the vectorised decoder
+    """
+
+    def __init__(self, *args, context_offset, context_start, max_context_mask, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.context_offset = context_offset
+        self.context_start = context_start
+        self.max_context_mask = max_context_mask
+
+
+class DocumentEncoding:
+    """
+    A context tokenized once for one tokenizer, laid out the way
+    squad_convert_examples_to_features lays it out: whitespace words as
+    SquadExample splits them, the word pieces of every word, and windows
+    of the context doc_stride tokens apart. Window layouts depend only on
+    the question's token count and are cached per count, so a new question
+    costs tokenizing the question and assembling its input ids.
+    """
+
+    def __init__(self, tokenizer, context_text, max_seq_length=512, doc_stride=256):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.doc_stride = doc_stride
+        self.example = SquadExample(
+            qas_id=None,
+            question_text="",
             context_text=context_text,
             answer_text=None,
             start_position_character=None,
@@ -50,77 +249,390 @@ def run_prediction(question_texts, context_text, model_path, n_best_size):
             answers=None,
         )
 
-        examples.append(example)
-    print(f'Created Squad Examples in {time.time()-timer} seconds')
+        words = self.example.doc_tokens
+        if not words:
+            self.input_ids, self.tok_to_orig_index = [], []
+        elif tokenizer.is_fast:
+            # One call over all words; word_ids maps each piece back to its word
+            encoding = tokenizer(words, is_split_into_words=True, add_special_tokens=False)
+            self.input_ids = encoding["input_ids"]
+            self.tok_to_orig_index = encoding.word_ids()
+        else:
+            self.input_ids, self.tok_to_orig_index = [], []
+            for i, word in enumerate(words):
+                ids = tokenizer.convert_tokens_to_ids(tokenizer.tokenize(word))
+                self.input_ids.extend(ids)
+                self.tok_to_orig_index.extend([i] * len(ids))
 
-    print(f'Number of CPUs: {cpu_count()}')
-    timer = time.time()
-    features, dataset = squad_convert_examples_to_features(
-        examples=examples,
-        tokenizer=tokenizer,
-        max_seq_length=max_seq_length,
-        doc_stride=doc_stride,
-        max_query_length=max_query_length,
-        is_training=False,
-        return_dataset="pt",
-        threads=cpu_count(),
+        self.tokens = tokenizer.convert_ids_to_tokens(self.input_ids)
+        self.is_special = np.isin(np.asarray(self.input_ids, dtype=np.int64), tokenizer.all_special_ids)
+
+        tokenizer_type = type(tokenizer).__name__.replace("Tokenizer", "").replace("Fast", "").lower()
+        self.sequence_added_tokens = tokenizer.model_max_length - tokenizer.max_len_single_sentence
+        if tokenizer_type in MULTI_SEP_TOKENS_TOKENIZERS_SET:
+            self.sequence_added_tokens += 1
+        self.sequence_pair_added_tokens = tokenizer.model_max_length - tokenizer.max_len_sentences_pair
+        self.layouts = {}
+
+    def windows(self, query_length):
+        """
+        [(start, length, token_to_orig_map, token_is_max_context, max_context_mask)]
+        for a question of query_length tokens; the maps are shared, so read only
+        """
+        layout = self.layouts.get(query_length)
+        if layout is not None:
+            return layout
+
+        num_tokens = len(self.input_ids)
+        max_length = self.max_seq_length - query_length - self.sequence_pair_added_tokens
+        starts = []
+        start = 0
+        while start < num_tokens:
+            starts.append(start)
+            if start + max_length >= num_tokens:
+                break
+            start += self.doc_stride
+
+        # A token's max-context window is the one where it has the most
+        # context on its shorter side (ties go to the earlier window)
+        best_score = np.full(num_tokens, -np.inf)
+        best_window = np.zeros(num_tokens, dtype=np.int64)
+        for window, start in enumerate(starts):
+            length = min(num_tokens - start, max_length)
+            positions = np.arange(start, start + length)
+            score = np.minimum(positions - start, start + length - 1 - positions) + 0.01 * length
+            better = score > best_score[start:start + length]
+            best_score[start:start + length][better] = score[better]
+            best_window[start:start + length][better] = window
+
+        offset = query_length + self.sequence_added_tokens
+        layout = []
+        for window, start in enumerate(starts):
+            length = min(num_tokens - start, max_length)
+            max_context_mask = best_window[start:start + length] == window
+            is_max_context = max_context_mask.tolist()
+            layout.append((
+                start,
+                length,
+                {offset + i: self.tok_to_orig_index[start + i] for i in range(length)},
+                {offset + i: is_max_context[i] for i in range(length)},
+                max_context_mask
+            ))
+        self.layouts[query_length] = layout
+        return layout
+
+    def span_text(self, start, end):
+        """The original words covering context tokens start..end (inclusive), space separated"""
+        return " ".join(self.example.doc_tokens[self.tok_to_orig_index[start]:self.tok_to_orig_index[end] + 1])
+
+    def features(self, query_ids, example_index, unique_id, qas_id=None):
+        """WindowFeatures for one question, identical to squad_convert_examples_to_features output"""
+        tokenizer = self.tokenizer
+        offset = len(query_ids) + self.sequence_added_tokens
+        features = []
+        for start, length, token_to_orig_map, token_is_max_context, max_context_mask in self.windows(len(query_ids)):
+            doc_ids = self.input_ids[start:start + length]
+            input_ids = tokenizer.build_inputs_with_special_tokens(query_ids, doc_ids)
+            token_type_ids = tokenizer.create_token_type_ids_from_sequences(query_ids, doc_ids)
+            padding = self.max_seq_length - len(input_ids)
+
+            # Only the question and special tokens need converting; the context's are cached
+            tokens = (tokenizer.convert_ids_to_tokens(input_ids[:offset]) + self.tokens[start:start + length]
+                      + tokenizer.convert_ids_to_tokens(input_ids[offset + length:]))
+
+            # Only context tokens can be in the answer (plus CLS, for no answer)
+            p_mask = np.ones(len(input_ids), dtype=np.int64)
+            p_mask[offset:offset + length] = self.is_special[start:start + length]
+            cls_index = input_ids.index(tokenizer.cls_token_id)
+            p_mask[cls_index] = 0
+
+            features.append(WindowFeatures(
+                input_ids + [tokenizer.pad_token_id] * padding,
+                [1] * len(input_ids) + [0] * padding,
+                token_type_ids + [0] * padding,
+                cls_index,
+                p_mask.tolist() + [1] * padding,
+                example_index=example_index,
+                unique_id=unique_id + len(features),
+                paragraph_len=length,
+                token_is_max_context=token_is_max_context,
+                tokens=tokens,
+                token_to_orig_map=token_to_orig_map,
+                start_position=0,
+                end_position=0,
+                is_impossible=False,
+                qas_id=qas_id,
+                context_offset=offset,
+                context_start=start,
+                max_context_mask=max_context_mask,
+            ))
+        return features
+
+
+class EncodingCache:
+    """LRU cache of DocumentEncodings keyed by model path and context hash"""
+
+    def __init__(self, max_documents=8):
+        self.max_documents = max_documents
+        self.encodings = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, model_path, tokenizer, context_text, max_seq_length, doc_stride):
+        context_hash = hashlib.sha256(context_text.encode('utf-8')).hexdigest()
+        key = (model_path, context_hash, max_seq_length, doc_stride)
+        with self.lock:
+            encoding = self.encodings.get(key)
+            if encoding is not None:
+                self.encodings.move_to_end(key)
+                return encoding
+
+        # Tokenize outside the lock; a concurrent miss on the same document just does it twice
+        encoding = DocumentEncoding(tokenizer, context_text, max_seq_length, doc_stride)
+        with self.lock:
+            self.encodings[key] = encoding
+            while len(self.encodings) > self.max_documents:
+                self.encodings.popitem(last=False)
+        return encoding
+
+
+encoding_cache = EncodingCache(max_documents=int(os.getenv('QA_ENCODING_CACHE_SIZE', '8')))
+
+
+def best_indexes(logits, n_best_size):
+    """Per row, the n_best_size highest logit indexes, best first (ties to the lower index)"""
+    k = min(n_best_size, logits.shape[1])
+    indexes = np.argpartition(-logits, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(logits, indexes, axis=1)
+    order = np.lexsort((indexes, -values))
+    return np.take_along_axis(indexes, order, axis=1)
+
+
+def softmax(scores):
+    exp_scores = np.exp(scores - np.max(scores))
+    return exp_scores / exp_scores.sum()
+
+
+def decode_predictions(examples, features, start_logits, end_logits, n_best_size, max_answer_length,
+                       null_score_diff_threshold, tokenizer, do_lower_case=False, encoding=None):
+    """
+    Vectorised compute_predictions_logits (SQuAD v2, with no-answer). start_logits
+    and end_logits are (num_features, seq_len) arrays aligned with features.
+    Candidate spans for every feature are scored and filtered as whole arrays;
+    only the few spans that reach an n-best list are turned into text.
+
+    With the document's encoding, answers are the whole original words the
+    span covers - what get_final_text returns for an uncased model run with
+    do_lower_case=False - without re-tokenizing every candidate's text.
+
+    Returns (predictions, nbest): qas_id -> answer text, and qas_id -> list of
+    {text, probability, start_logit, end_logit}, best first.
+    """
+    num_features, seq_len = start_logits.shape
+    start_indexes = best_indexes(start_logits, n_best_size)
+    end_indexes = best_indexes(end_logits, n_best_size)
+    start_values = np.take_along_axis(start_logits, start_indexes, axis=1)
+    end_values = np.take_along_axis(end_logits, end_indexes, axis=1)
+
+    # Spans must lie in the context, start where the token has its max context,
+    # end after they start and be at most max_answer_length tokens long
+    offsets = np.array([feature.context_offset for feature in features])
+    lengths = np.array([feature.paragraph_len for feature in features])
+    max_context = np.zeros((num_features, seq_len), dtype=bool)
+    for i, feature in enumerate(features):
+        max_context[i, feature.context_offset:feature.context_offset + feature.paragraph_len] = feature.max_context_mask
+
+    def in_context(indexes):
+        return (indexes >= offsets[:, None]) & (indexes < (offsets + lengths)[:, None])
+
+    starts = start_indexes[:, :, None]
+    ends = end_indexes[:, None, :]
+    valid = (
+        (in_context(start_indexes) & np.take_along_axis(max_context, start_indexes, axis=1))[:, :, None]
+        & in_context(end_indexes)[:, None, :]
+        & (ends >= starts)
+        & (ends - starts + 1 <= max_answer_length)
     )
-    print(f'Converted Examples to Features in {time.time()-timer} seconds')
+    scores = start_values[:, :, None] + end_values[:, None, :]
+    null_scores = start_logits[:, 0] + end_logits[:, 0]
 
-    eval_sampler = SequentialSampler(dataset)
-    eval_dataloader = DataLoader(dataset, sampler=eval_sampler, batch_size=10)
+    example_features = {}
+    for i, feature in enumerate(features):
+        example_features.setdefault(feature.example_index, []).append(i)
 
-    all_results = []
+    predictions = OrderedDict()
+    all_nbest = OrderedDict()
+    for example_index, example in enumerate(examples):
+        rows = np.asarray(example_features.get(example_index, []), dtype=np.int64)
+        nbest = []
+        seen = set()
 
-    timer = time.time()
-    for batch in eval_dataloader:
-        model.eval()
-        batch = tuple(t.to(device) for t in batch)
+        if len(rows):
+            null_row = rows[np.argmin(null_scores[rows])]
+            null_entry = ("", float(start_logits[null_row, 0]), float(end_logits[null_row, 0]))
+            score_null = null_entry[1] + null_entry[2]
 
-        with torch.no_grad():
-            inputs = {
-                "input_ids": batch[0],
-                "attention_mask": batch[1],
-                "token_type_ids": batch[2],
-            }
+            feature_ids, start_ids, end_ids = np.nonzero(valid[rows])
+            candidate_scores = scores[rows][feature_ids, start_ids, end_ids]
+            order = np.argsort(-candidate_scores, kind='stable')
+
+            # The no-answer candidate ranks after any span with an equal score
+            null_pending = True
+            for candidate in order:
+                if len(nbest) >= n_best_size:
+                    break
+                if null_pending and candidate_scores[candidate] < score_null:
+                    nbest.append(null_entry)
+                    seen.add("")
+                    null_pending = False
+                    if len(nbest) >= n_best_size:
+                        break
+
+                row = rows[feature_ids[candidate]]
+                start_index = int(start_indexes[row, start_ids[candidate]])
+                end_index = int(end_indexes[row, end_ids[candidate]])
+                feature = features[row]
+                if encoding is not None:
+                    text = encoding.span_text(feature.context_start + start_index - feature.context_offset,
+                                              feature.context_start + end_index - feature.context_offset)
+                else:
+                    text = span_text(example, feature, start_index, end_index, tokenizer, do_lower_case)
+                if text in seen:
+                    continue
+                seen.add(text)
+                nbest.append((text, float(start_logits[row, start_index]), float(end_logits[row, end_index])))
+
+            if null_pending and len(nbest) < n_best_size:
+                nbest.append(null_entry)
+                seen.add("")
+            if "" not in seen:
+                nbest.append(null_entry)
+            # A lone no-answer still needs a non-null alternative to compare against
+            if len(nbest) == 1:
+                nbest.insert(0, ("empty", 0.0, 0.0))
+        else:
+            # No features (empty context): only the no-answer candidate
+            score_null = 1000000
+            nbest = [("empty", 0.0, 0.0), ("", 0.0, 0.0)]
+
+        probabilities = softmax(np.array([start + end for _, start, end in nbest]))
+        all_nbest[example.qas_id] = [
+            {"text": text, "probability": float(probability), "start_logit": start, "end_logit": end}
+            for (text, start, end), probability in zip(nbest, probabilities)
+        ]
 
-            example_indices = batch[3]
+        best_text, best_start, best_end = next(entry for entry in nbest if entry[0])
+        if score_null - best_start - best_end > null_score_diff_threshold:
+            predictions[example.qas_id] = ""
+        else:
+            predictions[example.qas_id] = best_text
 
+    return predictions, all_nbest
+
+
+def span_text(example, feature, start_index, end_index, tokenizer, do_lower_case):
+    """Answer text for a token span projected back onto the original words, as compute_predictions_logits does"""
+    tok_text = tokenizer.convert_tokens_to_string(feature.tokens[start_index:end_index + 1])
+    tok_text = " ".join(tok_text.strip().split())
+    orig_tokens = example.doc_tokens[feature.token_to_orig_map[start_index]:feature.token_to_orig_map[end_index] + 1]
+    return get_final_text(tok_text, " ".join(orig_tokens), do_lower_case, False)
+
+
+def predict_logits(model, features, batch_size, device):
+    """
+    Run the model over all features in batches of similar length, each cut to
+    its longest feature. Returns (start_logits, end_logits) as float64 arrays
+    in feature order; positions past a feature's length are -inf.
+    """
+    input_ids = np.array([feature.input_ids for feature in features], dtype=np.int64)
+    attention_mask = np.array([feature.attention_mask for feature in features], dtype=np.int64)
+    token_type_ids = np.array([feature.token_type_ids for feature in features], dtype=np.int64)
+    seq_lengths = attention_mask.sum(axis=1)
+
+    start_logits = np.full(input_ids.shape, -np.inf)
+    end_logits = np.full(input_ids.shape, -np.inf)
+    by_length = np.argsort(-seq_lengths, kind='stable')
+    for batch_start in range(0, len(features), batch_size):
+        rows = by_length[batch_start:batch_start + batch_size]
+        width = int(seq_lengths[rows].max())
+        inputs = {
+            "input_ids": torch.from_numpy(input_ids[rows, :width]).to(device),
+            "attention_mask": torch.from_numpy(attention_mask[rows, :width]).to(device),
+            "token_type_ids": torch.from_numpy(token_type_ids[rows, :width]).to(device),
+        }
+        with torch.no_grad():
             outputs = model(**inputs)
+        start_logits[rows, :width] = outputs.start_logits.detach().cpu().numpy()
+        end_logits[rows, :width] = outputs.end_logits.detach().cpu().numpy()
 
-            for i, example_index in enumerate(example_indices):
-                eval_feature = features[example_index.item()]
-                unique_id = int(eval_feature.unique_id)
+    # Padding is never an answer; masking it keeps results independent of batching
+    padding = np.arange(input_ids.shape[1])[None, :] >= seq_lengths[:, None]
+    start_logits[padding] = -np.inf
+    end_logits[padding] = -np.inf
+    return start_logits, end_logits
 
-                output = [to_list(output[i]) for output in outputs.to_tuple()]
 
-                start_logits, end_logits = output
-                result = SquadResult(unique_id, start_logits, end_logits)
-                all_results.append(result)
-    print(f'Model predictions completed in {time.time()-timer} seconds') 
+QA_BATCH_SIZE = int(os.getenv('QA_BATCH_SIZE', '16'))
 
-    print(all_results)
 
-    output_nbest_file = None
-    if n_best_size > 1:
-        output_nbest_file = "nbest.json"
+def run_prediction(question_texts, context_text, model_path, n_best_size, backend=None,
+                   batch_size=None, return_nbest=False):
+    """
+    Answer questions about context_text with the extractive QA model. Returns
+    qas_id ("0", "1", ...) -> answer text ("" when there is no answer); with
+    return_nbest, also qas_id -> n-best list.
+    """
+    max_seq_length = 512
+    doc_stride = 256
+    n_best_size = n_best_size
+    max_query_length = 64
+    max_answer_length = 512
+    do_lower_case = False
+    null_score_diff_threshold = 0.0
+
+    config, tokenizer, model = model_registry.get(model_path, backend)
+    device = torch.device("cpu")
 
+    # The context is tokenized once per document and reused across calls
     timer = time.time()
-    final_predictions = compute_predictions_logits(
-        all_examples=examples,
-        all_features=features,
-        all_results=all_results,
+    encoding = encoding_cache.get(model_path, tokenizer, context_text, max_seq_length, doc_stride)
+    print(f'Loaded document encoding ({len(encoding.input_ids)} tokens) in {time.time()-timer} seconds')
+
+    timer = time.time()
+    examples = []
+    features = []
+    for i, question_text in enumerate(question_texts):
+        example = copy.copy(encoding.example)
+        example.qas_id = str(i)
+        example.question_text = question_text
+        examples.append(example)
+
+        query_ids = tokenizer.encode(question_text, add_special_tokens=False, truncation=True,
+                                     max_length=max_query_length)
+        features.extend(encoding.features(query_ids, i, 1000000000 + len(features), example.qas_id))
+    print(f'Converted Examples to Features in {time.time()-timer} seconds')
+
+    timer = time.time()
+    if features:
+        start_logits, end_logits = predict_logits(model, features, batch_size or QA_BATCH_SIZE, device)
+    else:
+        start_logits = end_logits = np.zeros((0, max_seq_length))
+    print(f'Model predictions for {len(features)} features completed in {time.time()-timer} seconds')
+
+    timer = time.time()
+    final_predictions, nbest = decode_predictions(
+        examples,
+        features,
+        start_logits,
+        end_logits,
         n_best_size=n_best_size,
         max_answer_length=max_answer_length,
-        do_lower_case=do_lower_case,
-        output_prediction_file=None,
-        output_nbest_file=output_nbest_file,
-        output_null_log_odds_file=None,
-        verbose_logging=False,
-        version_2_with_negative=True,
         null_score_diff_threshold=null_score_diff_threshold,
-        tokenizer=tokenizer
+        tokenizer=tokenizer,
+        do_lower_case=do_lower_case,
+        encoding=encoding
     )
     print(f'Logits converted to predictions in {time.time()-timer} seconds')
 
+    if return_nbest:
+        return final_predictions, nbest
     return final_predictions
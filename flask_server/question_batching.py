@@ -0,0 +1,50 @@
+import re
+
+from embeddings import RRF_K
+
+# "ANSWER 3:" headings in a combined answer, tolerating markdown decoration
+ANSWER_HEADING_PATTERN = re.compile(r'^[\s*#]*ANSWER\s+(\d+)[\s*]*:[\s*]*', re.IGNORECASE | re.MULTILINE)
+
+
+def group_questions(rankings, top_n=4, min_overlap=0.5, max_group_size=5):
+    """
+    Greedily group questions that would be answered from the same chunks.
+
+    rankings holds one [(score, chunk_id)] list per question. A question
+    joins the first group whose seed question's top_n chunks overlap its own
+    by at least min_overlap (Jaccard), otherwise it starts a new group.
+    Returns lists of question indices, in question order.
+    """
+    groups = []  # (seed chunk ids, member indices)
+    for question_id, ranking in enumerate(rankings):
+        top_chunks = {chunk_id for _, chunk_id in ranking[:top_n]}
+        for seed_chunks, members in groups:
+            if len(members) >= max_group_size or not top_chunks or not seed_chunks:
+                continue
+            if len(top_chunks & seed_chunks) / len(top_chunks | seed_chunks) >= min_overlap:
+                members.append(question_id)
+                break
+        else:
+            groups.append((top_chunks, [question_id]))
+    return [members for _, members in groups]
+
+
+def merge_rankings(rankings):
+    """One ranking for a group of questions by reciprocal rank fusion, best first"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (_, chunk_id) in enumerate(ranking):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(((score, chunk_id) for chunk_id, score in fused.items()), key=lambda item: (-item[0], item[1]))
+
+
+def parse_numbered_answers(response, count):
+    """Split a combined "ANSWER i:" response into {i: answer text} for i in 1..count"""
+    answers = {}
+    headings = list(ANSWER_HEADING_PATTERN.finditer(response))
+    for heading, next_heading in zip(headings, headings[1:] + [None]):
+        number = int(heading.group(1))
+        text = response[heading.end():next_heading.start() if next_heading else len(response)].strip()
+        if 1 <= number <= count and text and number not in answers:
+            answers[number] = text
+    return answers
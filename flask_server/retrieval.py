@@ -0,0 +1,341 @@
+import copy
+import heapq
+import math
+import os
+import re
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+from phrase_matcher import PhraseMatcher
+
+# Words ignored when extracting key terms from a question
+STOP_WORDS = frozenset([
+    'what', 'when', 'where', 'which', 'that', 'this', 'they', 'with', 'from', 'have',
+    'been', 'will', 'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can',
+    'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his',
+    'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy',
+    'did', 'she', 'use'
+])
+
+# Legal terms that get extra weight when they appear in both question and chunk
+LEGAL_TERM_WEIGHTS = {
+    'payment': 8, 'trustee': 10, 'compensation': 8, 'fee': 6,
+    'multiple': 5, 'assigned': 7, 'receives': 8, 'entitled': 7,
+    'distribution': 6, 'allocation': 6, 'divided': 5, 'shared': 5,
+    'court': 4, 'order': 4, 'approval': 5, 'bankruptcy': 8,
+    'estate': 6, 'debtor': 6, 'creditor': 5, 'proceeding': 4
+}
+
+# Procedural language that marks a chunk as operative text
+PROCEDURAL_TERMS = ('shall', 'must', 'required', 'entitled', 'pursuant', 'accordance')
+PROCEDURAL_MATCHER = PhraseMatcher(PROCEDURAL_TERMS)
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+STATUTE_REF_PATTERN = re.compile(r'§\s*\d+(?:\([a-z]\))?')
+SECTION_REF_PATTERN = re.compile(r'section\s+\d+')
+SUBSECTION_PATTERN = re.compile(r'\(\w+\)')
+AMOUNT_PATTERN = re.compile(r'\$[\d,]+|\b\d+\.\d+\b')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Headings that open a section, from the coarsest level to the finest
+SECTION_HEADING_PATTERNS = (
+    re.compile(r'^[ \t]*ARTICLE\s+(?:[IVXLCDM]+|\d+)\b', re.MULTILINE),
+    re.compile(r'^[ \t]*(?:Section|SECTION)\s+\d+(?:\.\d+)*', re.MULTILINE),
+    re.compile(r'^[ \t]*§\s*\d+', re.MULTILINE),
+)
+
+# Documents with more chunks than this get a section-level index
+SECTION_INDEX_MIN_CHUNKS = int(os.getenv('SECTION_INDEX_MIN_CHUNKS', '40'))
+# Sections searched per question, and the most chunks one section may span
+SECTION_TOP_K = int(os.getenv('SECTION_TOP_K', '3'))
+MAX_SECTION_CHUNKS = int(os.getenv('MAX_SECTION_CHUNKS', '16'))
+
+
+def extract_key_terms(question):
+    """Extract the scoring terms from a question (lowercased, stop words removed)"""
+    return [
+        word for word in TOKEN_PATTERN.findall(question.lower())
+        if len(word) > 2 and word not in STOP_WORDS
+    ]
+
+
+class ChunkIndex:
+    """
+    Per-document inverted index over text chunks.
+
+    Built once when a document is stored; holds term postings with term
+    frequencies plus query-independent flags (statute/section references,
+    subsections, amounts, procedural language) so a question only touches
+    the postings of its own terms.
+    """
+
+    def __init__(self, chunks=()):
+        self.num_chunks = 0
+        self.postings = {}
+        self.doc_lengths = []
+        self.statute_refs = []
+        self.has_section_ref = []
+        self.has_subsection = []
+        self.has_amount = []
+        self.priors = []
+        self.total_length = 0
+        self.avg_doc_length = 0.0
+        self.prior_order = []
+        self.extend(chunks)
+
+    def extend(self, chunks):
+        """
+        Index more chunks (e.g. pages still being ingested). Per-chunk data is
+        appended before postings reference it, and readers ignore postings past
+        num_chunks, so concurrent searches stay consistent.
+        """
+        first_id = self.num_chunks
+        new_postings = []
+
+        for chunk_id, chunk in enumerate(chunks, start=first_id):
+            chunk_lower = chunk.lower()
+            term_counts = Counter(TOKEN_PATTERN.findall(chunk_lower))
+            new_postings.append((chunk_id, term_counts))
+            self.doc_lengths.append(sum(term_counts.values()))
+            self.total_length += self.doc_lengths[-1]
+
+            statute_refs = len(STATUTE_REF_PATTERN.findall(chunk))
+            has_section_ref = SECTION_REF_PATTERN.search(chunk_lower) is not None
+            has_subsection = SUBSECTION_PATTERN.search(chunk) is not None
+            has_amount = AMOUNT_PATTERN.search(chunk) is not None
+            procedural_count = len(PROCEDURAL_MATCHER.find(chunk_lower))
+
+            self.statute_refs.append(statute_refs)
+            self.has_section_ref.append(has_section_ref)
+            self.has_subsection.append(has_subsection)
+            self.has_amount.append(has_amount)
+            self.priors.append(
+                statute_refs * 10 +
+                (5 if has_section_ref else 0) +
+                (2 if has_subsection else 0) +
+                (3 if has_amount else 0) +
+                procedural_count * 2
+            )
+
+        for chunk_id, term_counts in new_postings:
+            for term, tf in term_counts.items():
+                self.postings.setdefault(term, []).append((chunk_id, tf))
+
+        self.num_chunks = len(self.doc_lengths)
+        self.avg_doc_length = self.total_length / self.num_chunks if self.num_chunks else 0.0
+
+        # Chunk ids ordered by prior, used to fill results when few chunks match
+        self.prior_order = sorted(range(self.num_chunks), key=lambda i: self.priors[i], reverse=True)
+
+    def snapshot(self):
+        """
+        Read-only view of the index as it is now. It shares the append-only
+        storage, so taking one costs no copying of postings, and chunks added
+        by later extend() calls stay invisible to it.
+        """
+        return copy.copy(self)
+
+    def idf(self, term):
+        """BM25 inverse document frequency of a term"""
+        df = len(self.term_postings(term))
+        return math.log(1 + (self.num_chunks - df + 0.5) / (df + 0.5))
+
+    def score(self, question, chunk_ranges=None):
+        """
+        Score the chunks that contain at least one question term; returns
+        {chunk_id: score}. chunk_ranges limits scoring to [first, last) chunk id ranges.
+        """
+        question_terms = Counter(extract_key_terms(question))
+        scores = {}
+
+        for term, query_tf in question_terms.items():
+            postings = self.term_postings(term, chunk_ranges)
+            if not postings:
+                continue
+
+            # Longer terms are more specific; known legal terms carry their own weight
+            term_weight = 3 if len(term) > 4 else 2
+            term_weight += LEGAL_TERM_WEIGHTS.get(term, 0)
+            idf = self.idf(term)
+
+            for chunk_id, tf in postings:
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[chunk_id] / (self.avg_doc_length or 1)
+                bm25 = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + query_tf * term_weight * bm25
+
+        # Contextual bonus for multiple-trustee questions
+        if 'multiple' in question_terms and 'trustee' in question_terms:
+            multiple_ids = {chunk_id for chunk_id, _ in self.term_postings('multiple', chunk_ranges)}
+            for chunk_id, _ in self.term_postings('trustee', chunk_ranges):
+                if chunk_id in multiple_ids:
+                    scores[chunk_id] += 15
+
+        for chunk_id in scores:
+            scores[chunk_id] += self.priors[chunk_id]
+
+        return scores
+
+    def term_postings(self, term, chunk_ranges=None):
+        """Postings of a term, optionally only those inside the given chunk id ranges"""
+        postings = self.postings.get(term, [])
+        # Postings past num_chunks belong to chunks indexed after this view was taken
+        if postings and postings[-1][0] >= self.num_chunks:
+            postings = postings[:bisect_left(postings, (self.num_chunks,))]
+        if chunk_ranges is None or not postings:
+            return postings
+        # Postings are in chunk id order, so each range is a slice found by bisection
+        selected = []
+        for first, last in chunk_ranges:
+            selected.extend(postings[bisect_left(postings, (first,)):bisect_left(postings, (last,))])
+        return selected
+
+    def top_k(self, question, k, chunk_ranges=None):
+        """Return [(score, chunk_id)] for the k best chunks, highest score first"""
+        scores = self.score(question, chunk_ranges)
+        ranked = heapq.nlargest(k, ((score, chunk_id) for chunk_id, score in scores.items()),
+                                key=lambda item: (item[0], -item[1]))
+
+        # Too few matching chunks - fill up with the best chunks by prior alone
+        if len(ranked) < k:
+            for chunk_id in self.prior_order:
+                if len(ranked) >= k:
+                    break
+                if chunk_id in scores:
+                    continue
+                if chunk_ranges is None or any(first <= chunk_id < last for first, last in chunk_ranges):
+                    ranked.append((float(self.priors[chunk_id]), chunk_id))
+
+        return ranked
+
+
+    def top_k_batch(self, questions, k):
+        """
+        top_k for several questions in one vectorised pass: a BM25 matrix over
+        the questions' terms and all chunks is multiplied by a question-by-term
+        weight matrix. Returns one [(score, chunk_id)] list per question.
+        """
+        question_terms = [Counter(extract_key_terms(question)) for question in questions]
+        postings = {term: self.term_postings(term) for counts in question_terms for term in counts}
+        terms = sorted(term for term, term_postings in postings.items() if term_postings)
+        term_ids = {term: i for i, term in enumerate(terms)}
+
+        # Term-by-chunk BM25 matrix
+        doc_lengths = np.asarray(self.doc_lengths[:self.num_chunks], dtype=np.float64)
+        length_norm = 1 - BM25_B + BM25_B * doc_lengths / (self.avg_doc_length or 1)
+        bm25 = np.zeros((len(terms), self.num_chunks))
+        for i, term in enumerate(terms):
+            term_postings = postings[term]
+            chunk_ids = np.fromiter((chunk_id for chunk_id, _ in term_postings), dtype=np.int64,
+                                    count=len(term_postings))
+            tfs = np.fromiter((tf for _, tf in term_postings), dtype=np.float64, count=len(term_postings))
+            bm25[i, chunk_ids] = self.idf(term) * tfs * (BM25_K1 + 1) / (tfs + BM25_K1 * length_norm[chunk_ids])
+
+        # Question-by-term weights, as in score()
+        weights = np.zeros((len(questions), len(terms)))
+        for q, counts in enumerate(question_terms):
+            for term, query_tf in counts.items():
+                if term in term_ids:
+                    term_weight = (3 if len(term) > 4 else 2) + LEGAL_TERM_WEIGHTS.get(term, 0)
+                    weights[q, term_ids[term]] = query_tf * term_weight
+
+        scores = weights @ bm25
+        matched = ((weights > 0).astype(np.float64) @ (bm25 > 0)) > 0
+
+        # Contextual bonus for multiple-trustee questions
+        if 'multiple' in term_ids and 'trustee' in term_ids:
+            both = (bm25[term_ids['multiple']] > 0) & (bm25[term_ids['trustee']] > 0)
+            for q, counts in enumerate(question_terms):
+                if 'multiple' in counts and 'trustee' in counts:
+                    scores[q, both] += 15
+
+        scores += np.asarray(self.priors[:self.num_chunks], dtype=np.float64)
+        results = []
+        for q in range(len(questions)):
+            chunk_ids = np.flatnonzero(matched[q])
+            row = scores[q, chunk_ids]
+            order = np.lexsort((chunk_ids, -row))[:k]
+            ranked = [(float(row[i]), int(chunk_ids[i])) for i in order]
+
+            # Too few matching chunks - fill up with the best chunks by prior alone
+            for chunk_id in self.prior_order:
+                if len(ranked) >= k:
+                    break
+                if not matched[q, chunk_id]:
+                    ranked.append((float(self.priors[chunk_id]), chunk_id))
+            results.append(ranked)
+        return results
+
+
+def detect_sections(text, chunk_starts, max_section_chunks=MAX_SECTION_CHUNKS):
+    """
+    Group chunks into sections as [first, last) chunk id ranges. Sections
+    start at the coarsest heading level used at least twice (ARTICLE, then
+    Section N, then §); headings inside one chunk collapse into one section,
+    and sections longer than max_section_chunks are split.
+    """
+    num_chunks = len(chunk_starts)
+    boundaries = []
+    for pattern in SECTION_HEADING_PATTERNS:
+        offsets = [match.start() for match in pattern.finditer(text)]
+        if len(offsets) >= 2:
+            # A heading belongs to the first chunk starting at or after it
+            boundaries = [bisect_left(chunk_starts, offset) for offset in offsets]
+            break
+
+    starts = sorted({0, *(b for b in boundaries if b < num_chunks)})
+    sections = []
+    for first, last in zip(starts, starts[1:] + [num_chunks]):
+        for sub_first in range(first, last, max_section_chunks):
+            sections.append((sub_first, min(sub_first + max_section_chunks, last)))
+    return sections
+
+
+class SectionIndex:
+    """
+    Two-level index for large documents: questions are first matched against
+    whole sections, then only the chunks of the best sections are scored, so
+    the work per question stays small however long the document is.
+    Offers the same top_k as ChunkIndex.
+    """
+
+    def __init__(self, chunk_index, text, chunk_starts, chunk_ends, top_sections=SECTION_TOP_K):
+        self.chunk_index = chunk_index
+        self.top_sections = top_sections
+        self.section_ranges = detect_sections(text, chunk_starts)
+        self.section_index = ChunkIndex(
+            text[chunk_starts[first]:chunk_ends[last - 1]] for first, last in self.section_ranges
+        )
+
+    @property
+    def num_chunks(self):
+        return self.chunk_index.num_chunks
+
+    def top_k(self, question, k):
+        sections = self.section_index.top_k(question, self.top_sections)
+        chunk_ranges = sorted(self.section_ranges[section_id] for _, section_id in sections)
+        return self.chunk_index.top_k(question, k, chunk_ranges)
+
+    def top_k_batch(self, questions, k):
+        """Sections for all questions in one pass, then chunks within each question's sections"""
+        results = []
+        for question, sections in zip(questions, self.section_index.top_k_batch(questions, self.top_sections)):
+            chunk_ranges = sorted(self.section_ranges[section_id] for _, section_id in sections)
+            results.append(self.chunk_index.top_k(question, k, chunk_ranges))
+        return results
+
+
+def build_retrieval_index(chunks, chunk_index):
+    """
+    Index used to answer questions about a stored document: large documents
+    chunked as a ChunkView get a SectionIndex on top of their chunk index.
+    """
+    if len(chunks) <= SECTION_INDEX_MIN_CHUNKS or not hasattr(chunks, 'starts'):
+        return chunk_index
+    section_index = SectionIndex(chunk_index, chunks.text, chunks.starts, chunks.ends)
+    print(f"Built section index: {len(section_index.section_ranges)} sections over {len(chunks)} chunks")
+    return section_index
@@ -0,0 +1,142 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import RateLimitError
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight LLM calls: each success raises the limit by
+    1/limit (about +1 per round of calls), each 429 halves it and pauses
+    new calls until the server's Retry-After (or a backoff) has passed.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.time()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        with self.condition:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def on_rate_limited(self, pause_seconds):
+        with self.condition:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.paused_until = max(self.paused_until, time.time() + pause_seconds)
+
+
+class ChunkSimplifier:
+    """
+    Simplifies chunks concurrently while keeping their order. In-flight calls
+    are capped by an adaptive limiter that backs off on rate limiting; a chunk
+    that fails or stays rate limited after max_attempts keeps its original
+    text, without holding up the others.
+    """
+
+    def __init__(self, simplify, max_in_flight=4, max_attempts=3, backoff_base=1.0, backoff_max=30.0):
+        self.simplify = simplify
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='simplify')
+
+        self.stats_lock = threading.Lock()
+        self.simplified = 0
+        self.fallbacks = 0
+        self.rate_limited = 0
+
+    def simplify_all(self, chunks, on_progress=None):
+        """Return the simplified chunks in input order; on_progress(done, total) after each chunk"""
+        start_time = time.time()
+        limiter = AdaptiveConcurrencyLimiter(self.max_in_flight)
+        results = list(chunks)
+        done = [0]
+        progress_lock = threading.Lock()
+
+        def run(i):
+            results[i] = self._simplify_one(chunks[i], i, limiter)
+            with progress_lock:
+                done[0] += 1
+                if on_progress:
+                    on_progress(done[0], len(chunks))
+
+        futures = [self.executor.submit(run, i) for i in range(len(chunks))]
+        for future in futures:
+            future.result()
+
+        print(f"Simplified {len(chunks)} chunks in {time.time() - start_time:.2f}s "
+              f"(final concurrency limit {int(limiter.limit)})")
+        return results
+
+    def _simplify_one(self, chunk, i, limiter):
+        for attempt in range(self.max_attempts):
+            limiter.acquire()
+            try:
+                simplified = self.simplify(chunk)
+            except RateLimitError as e:
+                limiter.release()
+                delay = e.retry_after
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                limiter.on_rate_limited(delay)
+                self._count(rate_limited=1)
+                print(f"Chunk {i+1} rate limited, backing off {delay:.2f}s (attempt {attempt+1}/{self.max_attempts})")
+                continue
+            except Exception as e:
+                limiter.release()
+                print(f"Error simplifying chunk {i+1}: {e}")
+                break
+            limiter.release()
+            limiter.on_success()
+            self._count(simplified=1)
+            return simplified
+
+        self._count(fallbacks=1)
+        return chunk
+
+    def _count(self, simplified=0, fallbacks=0, rate_limited=0):
+        with self.stats_lock:
+            self.simplified += simplified
+            self.fallbacks += fallbacks
+            self.rate_limited += rate_limited
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "simplified": self.simplified,
+                "fallbacks": self.fallbacks,
+                "rate_limited": self.rate_limited
+            }
+
+
+def create_chunk_simplifier(simplify):
+    """ChunkSimplifier configured from SIMPLIFY_MAX_IN_FLIGHT and SIMPLIFY_MAX_ATTEMPTS"""
+    return ChunkSimplifier(
+        simplify,
+        max_in_flight=int(os.getenv('SIMPLIFY_MAX_IN_FLIGHT', '4')),
+        max_attempts=int(os.getenv('SIMPLIFY_MAX_ATTEMPTS', '3'))
+    )
@@ -0,0 +1,56 @@
+import pytest
+
+from validation_cascade import ValidationCascade
+
+QUARTERLY_REPORT = (
+    "Third quarter revenue grew 12% year over year as new clients signed on across "
+    "the retail segment. Contact the investor relations team for the full title list "
+    "of product lines. Operating costs rose slightly, driven by coffee and facilities "
+    "fees at the new office, while the act of consolidating vendors saved 4% overall. "
+    "We expect the fourth quarter to follow the same trend."
+)
+
+
+class RecordingValidator:
+    """Stands in for the LLM validator and records whether it was asked"""
+
+    def __init__(self, verdict):
+        self.verdict = verdict
+        self.calls = 0
+
+    def __call__(self, text_chunks):
+        self.calls += 1
+        return self.verdict
+
+
+def test_keyword_score_alone_never_accepts_a_document():
+    llm = RecordingValidator((False, 0.95, "Business Report", "Quarterly financial report"))
+    cascade = ValidationCascade(lambda text: (True, 1.0, ["act", "fee"]), llm)
+
+    is_legal, confidence, doc_type, explanation, tier = cascade.validate([QUARTERLY_REPORT])
+
+    assert llm.calls == 1
+    assert tier == "llm"
+    assert not is_legal
+
+
+def test_quarterly_report_goes_to_llm_with_the_real_keyword_scorer():
+    app = pytest.importorskip("app")
+    llm = RecordingValidator((False, 0.95, "Business Report", "Quarterly financial report"))
+    cascade = ValidationCascade(app.is_legal_document, llm)
+
+    is_legal, confidence, doc_type, explanation, tier = cascade.validate([QUARTERLY_REPORT])
+
+    assert tier == "llm"
+    assert not is_legal
+
+
+def test_keyword_tier_rejects_text_without_legal_language():
+    llm = RecordingValidator((True, 0.9, "Contract", "Looks legal"))
+    cascade = ValidationCascade(lambda text: (False, 0.0, []), llm)
+
+    is_legal, confidence, doc_type, explanation, tier = cascade.validate(["x" * 200])
+
+    assert llm.calls == 0
+    assert tier == "keyword"
+    assert not is_legal
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+# Texts shorter than this carry too few indicators for the local tiers to decide
+MIN_LOCAL_TEXT_LENGTH = 100
+
+
+class LocalDocumentClassifier:
+    """
+    Small CPU text classifier loaded with joblib, e.g. a scikit-learn
+    TfidfVectorizer + LogisticRegression pipeline trained on legal vs
+    non-legal documents. Any estimator with predict_proba over raw texts works;
+    the legal class is the one labelled 1, True or 'legal'.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.model = joblib.load(path)
+        classes = list(self.model.classes_)
+        self.legal_column = next(
+            (i for i, label in enumerate(classes) if label in (1, True, 'legal')),
+            len(classes) - 1
+        )
+        print(f"Loaded local document classifier from {path}")
+
+    def legal_probability(self, text):
+        return float(self.model.predict_proba([text])[0][self.legal_column])
+
+
+def load_local_classifier(path=None):
+    """Classifier from LEGAL_CLASSIFIER_PATH, or None when unset or unavailable"""
+    path = path or os.getenv('LEGAL_CLASSIFIER_PATH')
+    if not path:
+        return None
+    if not JOBLIB_AVAILABLE:
+        print("joblib not available, local document classifier disabled")
+        return None
+    try:
+        return LocalDocumentClassifier(path)
+    except Exception as e:
+        print(f"Could not load local document classifier from {path}: {e}")
+        return None
+
+
+class ValidationCascade:
+    """
+    Decides whether a document is legal with the cheapest tier that is sure:
+    the keyword scorer, then the optional local classifier, and only for the
+    uncertain band the LLM. Confidence is confidence in the returned verdict,
+    as with the LLM validator.
+
+    The keyword scorer counts substring hits ('act' in "contact", 'fee' in
+    "coffee"), so ordinary business text can score as highly as a statute.
+    Its score is only trusted to reject text with almost no legal language;
+    it never accepts a document on its own.
+    """
+
+    def __init__(self, keyword_scorer, llm_validator, local_classifier=None,
+                 keyword_non_legal_threshold=0.1,
+                 classifier_legal_threshold=0.9, classifier_non_legal_threshold=0.1,
+                 sample_chunks=3, sample_length=4000):
+        self.keyword_scorer = keyword_scorer
+        self.llm_validator = llm_validator
+        self.local_classifier = local_classifier
+        self.keyword_non_legal_threshold = keyword_non_legal_threshold
+        self.classifier_legal_threshold = classifier_legal_threshold
+        self.classifier_non_legal_threshold = classifier_non_legal_threshold
+        self.sample_chunks = sample_chunks
+        self.sample_length = sample_length
+
+        self.stats_lock = threading.Lock()
+        self.decisions = {"keyword": 0, "classifier": 0, "llm": 0}
+
+    def validate(self, text_chunks):
+        """Returns (is_legal, confidence, document_type, explanation, tier)"""
+        start_time = time.time()
+        sample_text = " ".join(text_chunks[:self.sample_chunks])[:self.sample_length]
+
+        decision = None
+        if len(sample_text.strip()) >= MIN_LOCAL_TEXT_LENGTH:
+            decision = self._keyword_tier(sample_text) or self._classifier_tier(sample_text)
+
+        if decision is None:
+            is_legal, confidence, doc_type, explanation = self.llm_validator(text_chunks)
+            decision = (is_legal, confidence, doc_type, explanation, "llm")
+
+        tier = decision[4]
+        with self.stats_lock:
+            self.decisions[tier] += 1
+        print(f"Document validation decided by {tier} tier in {(time.time() - start_time) * 1000:.1f}ms")
+        return decision
+
+    def _keyword_tier(self, sample_text):
+        is_legal, score, indicators = self.keyword_scorer(sample_text)
+        if score <= self.keyword_non_legal_threshold:
+            return False, 1.0 - score, "Non-legal", "Keyword scan found almost no legal language", "keyword"
+        return None
+
+    def _classifier_tier(self, sample_text):
+        if self.local_classifier is None:
+            return None
+        try:
+            probability = self.local_classifier.legal_probability(sample_text)
+        except Exception as e:
+            print(f"Local document classifier failed: {e}")
+            return None
+        if probability >= self.classifier_legal_threshold:
+            return True, probability, "Legal Document", "Local classifier identified legal content", "classifier"
+        if probability <= self.classifier_non_legal_threshold:
+            return False, 1.0 - probability, "Non-legal", "Local classifier found no legal content", "classifier"
+        return None
+
+    def stats(self):
+        with self.stats_lock:
+            total = sum(self.decisions.values())
+            return {
+                "decisions": dict(self.decisions),
+                "llm_rate": round(self.decisions["llm"] / total, 3) if total else 0.0,
+                "local_classifier": self.local_classifier is not None
+            }
+
+
+def create_validation_cascade(keyword_scorer, llm_validator):
+    """ValidationCascade configured from VALIDATION_* env vars and LEGAL_CLASSIFIER_PATH"""
+    return ValidationCascade(
+        keyword_scorer,
+        llm_validator,
+        local_classifier=load_local_classifier(),
+        keyword_non_legal_threshold=float(os.getenv('VALIDATION_KEYWORD_NON_LEGAL_THRESHOLD', '0.1')),
+        classifier_legal_threshold=float(os.getenv('VALIDATION_CLASSIFIER_LEGAL_THRESHOLD', '0.9')),
+        classifier_non_legal_threshold=float(os.getenv('VALIDATION_CLASSIFIER_NON_LEGAL_THRESHOLD', '0.1'))
+    )